@@ -0,0 +1,106 @@
+import numpy as np
+from numba import njit
+
+
+@njit(cache=True)
+def rsi(close, window):
+    """
+    Relative Strength Index using Wilder's smoothing (RMA).
+    The first average gain/loss is the simple mean of the first window changes,
+    so there is no value for the first window prices.
+    Changes to or from a missing price are skipped, leaving the averages as they were
+    """
+    result = np.full(close.shape[0], np.nan)
+    if close.shape[0] <= window:
+        return result
+
+    avg_gain = avg_loss = 0.0
+    changes = 0
+    for i in range(1, window + 1):
+        diff = close[i] - close[i - 1]
+        if not np.isfinite(diff):
+            continue
+        changes += 1
+        if diff > 0:
+            avg_gain += diff
+        else:
+            avg_loss -= diff
+    if changes == 0:
+        # Seeded by the first change after the window instead
+        avg_gain = avg_loss = np.nan
+    else:
+        avg_gain /= changes
+        avg_loss /= changes
+
+    for i in range(window, close.shape[0]):
+        if i > window:
+            diff = close[i] - close[i - 1]
+            if np.isfinite(diff) and np.isnan(avg_gain):
+                avg_gain = diff if diff > 0 else 0.0
+                avg_loss = -diff if diff < 0 else 0.0
+            elif np.isfinite(diff):
+                avg_gain = (
+                    avg_gain * (window - 1) + (diff if diff > 0 else 0.0)
+                ) / window
+                avg_loss = (
+                    avg_loss * (window - 1) + (-diff if diff < 0 else 0.0)
+                ) / window
+        if not np.isfinite(close[i]) or np.isnan(avg_gain):
+            continue
+        if avg_loss == 0:
+            result[i] = 50.0 if avg_gain == 0 else 100.0
+        else:
+            result[i] = 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+    return result
+
+
+@njit(cache=True)
+def rolling_median(values, window):
+    """
+    Median of each full window of values, kept in a sorted buffer that is updated
+    as the window slides. NaN until the window is full or while it contains a NaN
+    or an infinite value, same as pandas which treats both as missing
+    """
+    if window < 1:
+        raise ValueError("window must be at least 1")
+
+    result = np.full(values.shape[0], np.nan)
+    buffer = np.empty(window)
+    size = 0
+    missing_count = 0
+    for i in range(values.shape[0]):
+        if i >= window:
+            outgoing = values[i - window]
+            if not np.isfinite(outgoing):
+                missing_count -= 1
+            else:
+                j = 0
+                while buffer[j] != outgoing:
+                    j += 1
+                buffer[j : size - 1] = buffer[j + 1 : size]
+                size -= 1
+
+        incoming = values[i]
+        if not np.isfinite(incoming):
+            missing_count += 1
+        else:
+            j = size
+            while j > 0 and buffer[j - 1] > incoming:
+                buffer[j] = buffer[j - 1]
+                j -= 1
+            buffer[j] = incoming
+            size += 1
+
+        if i >= window - 1 and missing_count == 0:
+            middle = window // 2
+            if window % 2:
+                result[i] = buffer[middle]
+            else:
+                result[i] = (buffer[middle - 1] + buffer[middle]) / 2
+    return result
+
+
+def rsi_by_date(close, window):
+    """Map each trading day (YYYY-MM-DD) to the RSI of the given close prices"""
+    values = rsi(close.to_numpy(dtype=np.float64), window)
+    return dict(zip(close.index.strftime("%Y-%m-%d"), values.tolist()))
@@ -1,7 +1,9 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
 import pandas as pd
 import yfinance as yf
 from persistent_cache import PersistentCache
-from stockstats import wrap
 
 
 @PersistentCache()
@@ -13,11 +15,21 @@ def download_ticker_data(ticker, start, end):
         return pd.DataFrame()
 
 
+# Parameter sweep workers run many backtests over the same dates in one process,
+# so keep the loaded frames in memory instead of reading the disk cache every run
+@lru_cache(maxsize=None)
+def load_ticker_data(ticker, start, end):
+    return download_ticker_data(ticker, start=start, end=end).rename(columns=str.lower)
+
+
 def load_market_data(quote_dates, symbols):
-    market_data = {
-        symbol: wrap(
-            download_ticker_data(symbol, start=quote_dates[0], end=quote_dates[-1])
+    # Downloads are network bound, so fetch all the symbols at the same time
+    with ThreadPoolExecutor(max_workers=max(len(symbols), 1)) as executor:
+        frames = executor.map(
+            lambda symbol: load_ticker_data(
+                symbol, start=quote_dates[0], end=quote_dates[-1]
+            ),
+            symbols,
         )
-        for symbol in symbols
-    }
+        market_data = dict(zip(symbols, frames))
     return market_data
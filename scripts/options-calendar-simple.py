@@ -1,7 +1,8 @@
 #!/usr/bin/env -S uv run --quiet --script
 # /// script
 # dependencies = [
-#   "pandas"
+#   "pandas",
+#   "pyarrow",
 # ]
 # ///
 import logging
@@ -12,13 +13,12 @@ from logger import setup_logging
 from options_analysis import (
     ContractType,
     GenericRunner,
-    Leg,
-    LegType,
     OptionsData,
     OptionsDatabase,
     PositionType,
     Trade,
     add_standard_cli_arguments,
+    build_open_leg,
 )
 
 
@@ -48,6 +48,12 @@ class LongPutCalendarStrategy(GenericRunner):
         self.front_dte = args.front_dte
         self.back_dte = args.back_dte
 
+    def pre_run(self, options_db, quote_dates):
+        options_db.preload_next_expiries(quote_dates, self.front_dte)
+        options_db.preload_next_expiries(quote_dates, self.back_dte)
+        options_db.preload_options_closest_to_price(quote_dates, self.front_dte)
+        options_db.preload_options_closest_to_price(quote_dates, self.back_dte)
+
     def build_trade(self, options_db: OptionsDatabase, quote_date) -> Optional[Trade]:
         expiry_front_dte, front_dte_found = options_db.get_next_expiry_by_dte(
             quote_date, self.front_dte
@@ -64,8 +70,13 @@ class LongPutCalendarStrategy(GenericRunner):
             return None
 
         logging.debug(
-            f"Quote date: {quote_date} -> {expiry_front_dte=} ({front_dte_found=:.1f}), "
-            f"{expiry_back_dte=} ({back_dte_found=:.1f})"
+            "Quote date: %s -> expiry_front_dte=%r (front_dte_found=%.1f), "
+            "expiry_back_dte=%r (back_dte_found=%.1f)",
+            quote_date,
+            expiry_front_dte,
+            front_dte_found,
+            expiry_back_dte,
+            back_dte_found,
         )
 
         front_od: OptionsData = options_db.get_options_data_closest_to_price(
@@ -81,48 +92,28 @@ class LongPutCalendarStrategy(GenericRunner):
             )
             return None
 
-        if front_od.p_last in [None, 0] or back_od.p_last in [None, 0]:
+        if not front_od.p_last or not back_od.p_last:
             logging.warning(
                 f"⚠️ Bad data found on {quote_date} when creating a new trade. One of {front_od.p_last=}, {back_od.p_last=} is not valid."
             )
             return None
 
-        trade_legs = [
-            Leg(
-                leg_quote_date=quote_date,
-                leg_expiry_date=expiry_front_dte,
-                leg_type=LegType.TRADE_OPEN,
-                position_type=PositionType.SHORT,
-                contract_type=ContractType.PUT,
-                strike_price=front_od.strike,
-                underlying_price_open=front_od.underlying_last,
-                premium_open=front_od.p_last,
-                premium_current=0,
-                delta=front_od.p_delta,
-                gamma=front_od.p_gamma,
-                vega=front_od.p_vega,
-                theta=front_od.p_theta,
-                iv=front_od.p_iv,
-            ),
-            Leg(
-                leg_quote_date=quote_date,
-                leg_expiry_date=expiry_back_dte,
-                leg_type=LegType.TRADE_OPEN,
-                position_type=PositionType.LONG,
-                contract_type=ContractType.PUT,
-                strike_price=back_od.strike,
-                underlying_price_open=back_od.underlying_last,
-                premium_open=back_od.p_last,
-                premium_current=0,
-                delta=back_od.p_delta,
-                gamma=back_od.p_gamma,
-                vega=back_od.p_vega,
-                theta=back_od.p_theta,
-                iv=back_od.p_iv,
-            ),
-        ]
+        front_leg = build_open_leg(
+            front_od,
+            quote_date,
+            expiry_front_dte,
+            PositionType.SHORT,
+            ContractType.PUT,
+        )
+        back_leg = build_open_leg(
+            back_od,
+            quote_date,
+            expiry_back_dte,
+            PositionType.LONG,
+            ContractType.PUT,
+        )
         premium_captured_calculated = round(
-            sum(leg.premium_open for leg in trade_legs), 2
+            front_leg.premium_open + back_leg.premium_open, 2
         )
         return Trade(
             trade_date=quote_date,
@@ -130,7 +121,7 @@ class LongPutCalendarStrategy(GenericRunner):
             dte=self.front_dte,
             status="OPEN",
             premium_captured=premium_captured_calculated,
-            legs=trade_legs,
+            legs=[front_leg, back_leg],
         )
 
 
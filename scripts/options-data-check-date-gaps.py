@@ -69,19 +69,19 @@ def check_date_gaps(conn, gap_days):
     df["QUOTE_READTIME"] = pd.to_datetime(df["QUOTE_READTIME"])
 
     # Calculate the difference between consecutive dates
-    df["date_diff"] = df["QUOTE_READTIME"].diff()
+    df["previous_date"] = df["QUOTE_READTIME"].shift()
+    df["date_diff"] = df["QUOTE_READTIME"] - df["previous_date"]
 
     # Find gaps greater than specified days
     gaps = df[df["date_diff"] > pd.Timedelta(days=gap_days)]
 
     if len(gaps) > 0:
         logging.info(f"Checking for gaps greater than {gap_days} days...")
-        for idx, row in gaps.iterrows():
-            previous_date = df.loc[idx - 1, "QUOTE_READTIME"].date()
-            current_date = row["QUOTE_READTIME"].date()
-            gap_size = row["date_diff"].days
+        for previous_date, current_date, date_diff in gaps[
+            ["previous_date", "QUOTE_READTIME", "date_diff"]
+        ].itertuples(index=False, name=None):
             logging.warning(
-                f"Found gap of {gap_size} days between {previous_date} and {current_date}"
+                f"Found gap of {date_diff.days} days between {previous_date.date()} and {current_date.date()}"
             )
     else:
         logging.info(f"No gaps greater than {gap_days} days found in the data")
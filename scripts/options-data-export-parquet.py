@@ -0,0 +1,111 @@
+#!/usr/bin/env -S uv run --quiet --script
+# /// script
+# dependencies = [
+#   "pandas",
+#   "pyarrow",
+# ]
+# ///
+"""
+A script to export the options data from SQLite into a Parquet dataset.
+The dataset is partitioned by expiry date so backtests can read it with the arrow backend.
+
+Usage:
+./options-data-export-parquet.py -h
+./options-data-export-parquet.py --db-path data/spx_eod.db --output data/spx_eod_parquet -v
+"""
+
+import logging
+import sqlite3
+from argparse import ArgumentParser, RawDescriptionHelpFormatter
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from logger import setup_logging
+
+SQLITE_TO_ARROW_TYPES = {
+    "INTEGER": pa.int64(),
+    "REAL": pa.float64(),
+    "TEXT": pa.string(),
+}
+
+
+def parse_args():
+    parser = ArgumentParser(
+        description=__doc__, formatter_class=RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "-v",
+        "--verbose",
+        action="count",
+        default=0,
+        dest="verbose",
+        help="Increase verbosity of logging output",
+    )
+    parser.add_argument(
+        "--db-path",
+        required=True,
+        help="Path to the SQLite database file",
+    )
+    parser.add_argument(
+        "--output",
+        type=Path,
+        required=True,
+        help="Output directory for the Parquet dataset",
+    )
+    return parser.parse_args()
+
+
+def options_data_schema(conn):
+    """Build an arrow schema so every partition uses the same column types"""
+    columns = conn.execute("PRAGMA table_info(options_data)").fetchall()
+    return pa.schema(
+        [
+            (name, SQLITE_TO_ARROW_TYPES.get(column_type.upper(), pa.float64()))
+            for _, name, column_type, *_ in columns
+            # Partition column is stored in the directory name
+            if name != "EXPIRE_DATE"
+        ]
+    )
+
+
+def export_options_data(conn, output):
+    schema = options_data_schema(conn)
+    expiry_dates = [
+        row[0]
+        for row in conn.execute(
+            "SELECT DISTINCT EXPIRE_DATE FROM options_data ORDER BY EXPIRE_DATE"
+        )
+    ]
+    logging.info(f"Exporting {len(expiry_dates)} expiry dates to {output}")
+
+    for expiry_date in expiry_dates:
+        df = pd.read_sql_query(
+            f"SELECT {', '.join(schema.names)} FROM options_data WHERE EXPIRE_DATE = ?",
+            conn,
+            params=(expiry_date,),
+        )
+        partition = output / f"EXPIRE_DATE={expiry_date}"
+        partition.mkdir(parents=True, exist_ok=True)
+        pq.write_table(
+            pa.Table.from_pandas(df, schema=schema, preserve_index=False),
+            partition / "part-0.parquet",
+        )
+        logging.debug(f"Exported {len(df)} rows for expiry {expiry_date}")
+
+
+def main(args):
+    logging.info(f"Using SQLite database at: {args.db_path}")
+    conn = sqlite3.connect(args.db_path)
+
+    try:
+        export_options_data(conn, args.output)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    setup_logging(args.verbose)
+    main(args)
@@ -4,7 +4,8 @@
 #   "pandas",
 #   "yfinance",
 #   "persistent-cache@git+https://github.com/namuan/persistent-cache",
-#   "stockstats",
+#   "numba",
+#   "pyarrow",
 # ]
 # ///
 """ """
@@ -13,18 +14,18 @@ import logging
 from argparse import ArgumentParser, RawDescriptionHelpFormatter
 from typing import Optional
 
+from indicators import rsi_by_date
 from logger import setup_logging
 from market_data import load_market_data
 from options_analysis import (
     ContractType,
     GenericRunner,
-    Leg,
-    LegType,
     OptionsData,
     OptionsDatabase,
     PositionType,
     Trade,
     add_standard_cli_arguments,
+    build_open_leg,
 )
 
 
@@ -78,16 +79,17 @@ class ShortPutCallStrategy(GenericRunner):
         self.dte = args.dte
         self.short_put_delta = args.short_put_delta
         self.short_call_delta = args.short_call_delta
-        self.rsi_indicator = f"rsi_{args.rsi}"
+        self.rsi = args.rsi
         self.rsi_low_threshold = args.rsi_low_threshold
         self.rsi_high_threshold = args.rsi_high_threshold
-        self.external_df = None
+        self._rsi_map = {}
 
     def pre_run(self, options_db, quote_dates):
+        options_db.preload_next_expiries(quote_dates, self.dte)
+
         underlying = "SPY"
         market_data = load_market_data(quote_dates, [underlying])
-        self.external_df = market_data[underlying]
-        _ = self.external_df[self.rsi_indicator]
+        self._rsi_map = rsi_by_date(market_data[underlying]["close"], self.rsi)
 
     def allowed_to_create_new_trade(self, options_db, data_for_trade_management):
         allowed_based_on_default_checks = super().allowed_to_create_new_trade(
@@ -114,7 +116,12 @@ class ShortPutCallStrategy(GenericRunner):
             logging.warning(f"⚠️ Unable to find {self.dte} expiry. {expiry_dte=}")
             return None
 
-        logging.debug(f"Quote date: {quote_date} -> {expiry_dte=} ({dte_found=:.1f}), ")
+        logging.debug(
+            "Quote date: %s -> expiry_dte=%r (dte_found=%.1f)",
+            quote_date,
+            expiry_dte,
+            dte_found,
+        )
         put_option: OptionsData = options_db.get_options_by_delta(
             ContractType.PUT,
             PositionType.SHORT,
@@ -130,70 +137,48 @@ class ShortPutCallStrategy(GenericRunner):
             self.short_call_delta,
         )
 
-        if (
-            put_option.p_last is None
-            or put_option.p_last == 0
-            or call_option.c_last is None
-            or call_option.c_last == 0
-        ):
+        if not put_option.p_last or not call_option.c_last:
             logging.warning(
                 f"⚠️ Bad data found: On {quote_date=} Either {put_option.p_last=} or {call_option.c_last=} is not valid"
             )
             return None
 
         logging.debug(
-            f"Contract ({expiry_dte=}): "
-            f"{ put_option.underlying_last=:.2f}, { put_option.strike=:.2f}, { put_option.p_last=:.2f}"
-            f"{ call_option.underlying_last=:.2f}, { call_option.strike=:.2f}, { call_option.c_last=:.2f}"
+            "Contract (expiry_dte=%r): "
+            "put underlying_last=%.2f, strike=%.2f, p_last=%.2f, "
+            "call underlying_last=%.2f, strike=%.2f, c_last=%.2f",
+            expiry_dte,
+            put_option.underlying_last,
+            put_option.strike,
+            put_option.p_last,
+            call_option.underlying_last,
+            call_option.strike,
+            call_option.c_last,
         )
 
         if self.current_rsi_value < self.rsi_low_threshold:
-            trade_legs = [
-                Leg(
-                    leg_quote_date=quote_date,
-                    leg_expiry_date=expiry_dte,
-                    leg_type=LegType.TRADE_OPEN,
-                    position_type=PositionType.SHORT,
-                    contract_type=ContractType.PUT,
-                    strike_price=put_option.strike,
-                    underlying_price_open=put_option.underlying_last,
-                    premium_open=put_option.p_last,
-                    premium_current=0,
-                    delta=put_option.p_delta,
-                    gamma=put_option.p_gamma,
-                    vega=put_option.p_vega,
-                    theta=put_option.p_theta,
-                    iv=put_option.p_iv,
-                ),
-            ]
+            short_leg = build_open_leg(
+                put_option,
+                quote_date,
+                expiry_dte,
+                PositionType.SHORT,
+                ContractType.PUT,
+            )
         elif self.current_rsi_value > self.rsi_high_threshold:
-            trade_legs = [
-                Leg(
-                    leg_quote_date=quote_date,
-                    leg_expiry_date=expiry_dte,
-                    leg_type=LegType.TRADE_OPEN,
-                    position_type=PositionType.SHORT,
-                    contract_type=ContractType.CALL,
-                    strike_price=call_option.strike,
-                    underlying_price_open=call_option.underlying_last,
-                    premium_open=call_option.c_last,
-                    premium_current=0,
-                    delta=call_option.c_delta,
-                    gamma=call_option.c_gamma,
-                    vega=call_option.c_vega,
-                    theta=call_option.c_theta,
-                    iv=call_option.c_iv,
-                ),
-            ]
+            short_leg = build_open_leg(
+                call_option,
+                quote_date,
+                expiry_dte,
+                PositionType.SHORT,
+                ContractType.CALL,
+            )
         else:
             return None
 
-        premium_captured_calculated = round(
-            sum(leg.premium_open for leg in trade_legs), 2
-        )
+        premium_captured_calculated = round(short_leg.premium_open, 2)
 
         logging.info(
-            f"RSI is {self.current_rsi_value:.2f}. Created Short {trade_legs[0].contract_type} trade for {premium_captured_calculated=}"
+            f"RSI is {self.current_rsi_value:.2f}. Created Short {short_leg.contract_type} trade for {premium_captured_calculated=}"
         )
 
         return Trade(
@@ -202,13 +187,11 @@ class ShortPutCallStrategy(GenericRunner):
             dte=self.dte,
             status="OPEN",
             premium_captured=premium_captured_calculated,
-            legs=trade_legs,
+            legs=[short_leg],
         )
 
     def rsi_value_for(self, quote_date):
-        if quote_date not in self.external_df.index:
-            return None
-        return self.external_df.loc[quote_date, self.rsi_indicator]
+        return self._rsi_map.get(quote_date)
 
 
 def main(args):
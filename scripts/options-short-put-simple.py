@@ -4,25 +4,29 @@
 #   "pandas",
 #   "yfinance",
 #   "persistent-cache@git+https://github.com/namuan/persistent-cache",
-#   "stockstats",
+#   "numba",
+#   "pyarrow",
 # ]
 # ///
 import logging
 from argparse import ArgumentParser, RawDescriptionHelpFormatter
 from typing import Optional
 
+from indicators import rsi_by_date
 from logger import setup_logging
 from market_data import load_market_data
 from options_analysis import (
     ContractType,
     GenericRunner,
-    Leg,
-    LegType,
     OptionsData,
     OptionsDatabase,
     PositionType,
     Trade,
     add_standard_cli_arguments,
+    add_sweep_cli_arguments,
+    build_open_leg,
+    is_parameter_sweep,
+    run_parameter_sweep,
 )
 
 
@@ -31,6 +35,7 @@ def parse_args():
         description=__doc__, formatter_class=RawDescriptionHelpFormatter
     )
     add_standard_cli_arguments(parser)
+    add_sweep_cli_arguments(parser)
     parser.add_argument(
         "--dte",
         type=int,
@@ -62,35 +67,41 @@ class ShortPutStrategy(GenericRunner):
         self.dte = args.dte
         self.short_delta = args.short_put_delta
         self.rsi_check_required = args.rsi and args.rsi_low_threshold
-        self.rsi_indicator = f"rsi_{args.rsi}"
+        self.rsi = args.rsi
         self.rsi_low_threshold = args.rsi_low_threshold
-        self.external_df = None
+        self._allowed_dates = set()
 
     def pre_run(self, options_db, quote_dates):
+        options_db.preload_next_expiries(quote_dates, self.dte)
+        options_db.preload_options_by_delta(
+            ContractType.PUT,
+            PositionType.SHORT,
+            quote_dates,
+            self.dte,
+            self.short_delta,
+        )
+
         if self.rsi_check_required:
             underlying = "SPY"
             market_data = load_market_data(quote_dates, [underlying])
-            self.external_df = market_data[underlying]
-            _ = self.external_df[self.rsi_indicator]
+            rsi_map = rsi_by_date(market_data[underlying]["close"], self.rsi)
+            self._allowed_dates = {
+                quote_date
+                for quote_date, rsi_value in rsi_map.items()
+                if rsi_value <= self.rsi_low_threshold
+            }
 
     def allowed_to_create_new_trade(self, options_db, data_for_trade_management):
-        allowed_based_on_default_checks = super().allowed_to_create_new_trade(
-            options_db, data_for_trade_management
-        )
-        if not allowed_based_on_default_checks:
+        # RSI Check first as it avoids querying open trades on most days
+        if (
+            self.rsi_check_required
+            and data_for_trade_management.quote_date not in self._allowed_dates
+        ):
             return False
 
-        if not self.rsi_check_required:
-            return True
-
-        # RSI Check
-        if data_for_trade_management.quote_date in self.external_df.index:
-            rsi_value = self.external_df.loc[
-                data_for_trade_management.quote_date, self.rsi_indicator
-            ]
-            return rsi_value <= self.rsi_low_threshold
-        else:
-            return False
+        return super().allowed_to_create_new_trade(
+            options_db, data_for_trade_management
+        )
 
     def build_trade(self, options_db: OptionsDatabase, quote_date) -> Optional[Trade]:
         expiry_dte, dte_found = options_db.get_next_expiry_by_dte(quote_date, self.dte)
@@ -98,7 +109,12 @@ class ShortPutStrategy(GenericRunner):
             logging.warning(f"⚠️ Unable to find {self.dte} expiry. {expiry_dte=}")
             return None
 
-        logging.debug(f"Quote date: {quote_date} -> {expiry_dte=} ({dte_found=:.1f}), ")
+        logging.debug(
+            "Quote date: %s -> expiry_dte=%r (dte_found=%.1f)",
+            quote_date,
+            expiry_dte,
+            dte_found,
+        )
         od: OptionsData = options_db.get_options_by_delta(
             ContractType.PUT,
             PositionType.SHORT,
@@ -106,7 +122,7 @@ class ShortPutStrategy(GenericRunner):
             expiry_dte,
             self.short_delta,
         )
-        if not od or od.p_last in [None, 0]:
+        if not od or not od.p_last:
             logging.warning(
                 "⚠️ Bad data found: "
                 + (
@@ -118,31 +134,18 @@ class ShortPutStrategy(GenericRunner):
             return None
 
         logging.debug(
-            f"Contract ({expiry_dte=}): { od.underlying_last=:.2f}, { od.strike=:.2f}, { od.c_last=:.2f}, { od.p_last=:.2f}"
+            "Contract (expiry_dte=%r): underlying_last=%.2f, strike=%.2f, c_last=%.2f, p_last=%.2f",
+            expiry_dte,
+            od.underlying_last,
+            od.strike,
+            od.c_last,
+            od.p_last,
         )
 
-        trade_legs = [
-            Leg(
-                leg_quote_date=quote_date,
-                leg_expiry_date=expiry_dte,
-                leg_type=LegType.TRADE_OPEN,
-                position_type=PositionType.SHORT,
-                contract_type=ContractType.PUT,
-                strike_price=od.strike,
-                underlying_price_open=od.underlying_last,
-                premium_open=od.p_last,
-                premium_current=0,
-                delta=od.p_delta,
-                gamma=od.p_gamma,
-                vega=od.p_vega,
-                theta=od.p_theta,
-                iv=od.p_iv,
-            ),
-        ]
-
-        premium_captured_calculated = round(
-            sum(leg.premium_open for leg in trade_legs), 2
+        short_put_leg = build_open_leg(
+            od, quote_date, expiry_dte, PositionType.SHORT, ContractType.PUT
         )
+        premium_captured_calculated = round(short_put_leg.premium_open, 2)
 
         return Trade(
             trade_date=quote_date,
@@ -150,11 +153,15 @@ class ShortPutStrategy(GenericRunner):
             dte=self.dte,
             status="OPEN",
             premium_captured=premium_captured_calculated,
-            legs=trade_legs,
+            legs=[short_put_leg],
         )
 
 
 def main(args):
+    if is_parameter_sweep(args):
+        run_parameter_sweep(ShortPutStrategy, args)
+        return
+
     with ShortPutStrategy(args) as runner:
         runner.run()
 
@@ -2,9 +2,10 @@
 # /// script
 # dependencies = [
 #   "pandas",
-#   "stockstats",
+#   "numba",
 #   "yfinance",
 #   "persistent-cache@git+https://github.com/namuan/persistent-cache",
+#   "pyarrow",
 # ]
 # ///
 from argparse import ArgumentParser, RawDescriptionHelpFormatter
@@ -12,6 +13,9 @@ from argparse import ArgumentParser, RawDescriptionHelpFormatter
 from logger import setup_logging
 from options_analysis import (
     add_standard_cli_arguments,
+    add_sweep_cli_arguments,
+    is_parameter_sweep,
+    run_parameter_sweep,
 )
 from short_straddle_strategies import ShortStraddleStrategy
 
@@ -21,6 +25,7 @@ def parse_args():
         description=__doc__, formatter_class=RawDescriptionHelpFormatter
     )
     add_standard_cli_arguments(parser)
+    add_sweep_cli_arguments(parser)
     parser.add_argument(
         "--dte",
         type=int,
@@ -70,6 +75,10 @@ def parse_args():
 
 
 def main(args):
+    if is_parameter_sweep(args):
+        run_parameter_sweep(ShortStraddleStrategy, args)
+        return
+
     with ShortStraddleStrategy(args) as runner:
         runner.run()
 
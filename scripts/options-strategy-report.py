@@ -37,18 +37,36 @@ python options-strategy-report.py --db-path data/trades.db --strategy-name Short
 """
 
 import argparse
+import atexit
 import logging
 import sqlite3
-from dataclasses import dataclass
+from functools import lru_cache
+from typing import NamedTuple
 
+import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
 from logger import setup_logging
 from plotly.subplots import make_subplots
 
+# Run parameters left out when describing a backtest run
+NON_STRATEGY_PARAMS = {
+    "verbose",
+    "db_path",
+    "start_date",
+    "end_date",
+    "backend",
+    "parquet_path",
+}
 
-@dataclass
-class BacktestRun:
+# Month names indexed by month number - 1, built once instead of per table cell
+MONTH_NAMES = [pd.Timestamp(2024, month, 1).strftime("%B") for month in range(1, 13)]
+MONTH_ABBREVIATIONS = [
+    pd.Timestamp(2024, month, 1).strftime("%b") for month in range(1, 13)
+]
+
+
+class BacktestRun(NamedTuple):
     run_id: int
     datetime: str
     strategy: str
@@ -58,61 +76,107 @@ class BacktestRun:
     trade_legs_table_name: str
 
 
-def create_html_output(fig):
-    html_content = f"""
+HTML_HEADER = """
     <html>
     <head>
         <title>Trading Analysis</title>
         <script src="https://cdn.plot.ly/plotly-latest.min.js"></script>
         <style>
-            body {{
+            body {
                 font-family: Arial, sans-serif;
                 margin: 20px;
                 background-color: #f5f5f5;
-            }}
-            .container {{
+            }
+            .container {
                 max-width: 1200px;
                 margin: 0 auto;
                 background-color: white;
                 padding: 20px;
                 box-shadow: 0 0 10px rgba(0,0,0,0.1);
                 border-radius: 5px;
-            }}
-            .graph-container {{
+            }
+            .graph-container {
                 margin-bottom: 30px;
-            }}
+            }
         </style>
     </head>
     <body>
         <div class="container">
             <div class="graph-container">
-                {fig.to_html(full_html=False, include_plotlyjs=False)}
+                """
+
+HTML_FOOTER = """
             </div>
         </div>
     </body>
     </html>
     """
-    return html_content
 
 
-def fetch_data(db_path, table_name):
+def write_html_output(fig, file):
+    """Write the report page straight to the file instead of building it in memory first"""
+    file.write(HTML_HEADER)
+    # Traces are validated when they are added, no need to walk the figure again
+    fig.write_html(file, full_html=False, include_plotlyjs=False, validate=False)
+    file.write(HTML_FOOTER)
+
+
+@lru_cache(maxsize=4)
+def _open_db(db_path):
+    """One connection per database, shared by all the queries of a report"""
     conn = sqlite3.connect(db_path)
+    # Trade tables are read through the OS page cache rather than read() calls
+    conn.execute("PRAGMA mmap_size=268435456")
+    conn.execute("PRAGMA cache_size=-65536")
+    atexit.register(conn.close)
+    return conn
+
+
+# SQLite allows at most 500 SELECTs in one compound query
+MAX_TABLES_PER_QUERY = 500
+
+
+def fetch_all_data(db_path, backtest_runs):
+    """Read the trades of all the backtest runs with UNION ALL queries, keyed by table name key"""
+    conn = _open_db(db_path)
+    # Runs sharing a table name key are reported once, as the first run with that key
+    unique_runs = list(backtest_runs_by_key(backtest_runs).values())
+
+    frames = []
+    for start in range(0, len(unique_runs), MAX_TABLES_PER_QUERY):
+        runs = unique_runs[start : start + MAX_TABLES_PER_QUERY]
+        query = " UNION ALL ".join(
+            f"""
+            SELECT
+                ? AS TableNameKey,
+                Date,
+                PremiumCaptured,
+                ClosingPremium,
+                (PremiumCaptured + ClosingPremium) AS PremiumKept,
+                ClosedTradeAt
+            FROM {run.trade_table_name}
+            """
+            for run in runs
+        )
+        params = [run.table_name_key for run in runs]
+        # Dates are parsed once here and used as datetimes by the rest of the report
+        frames.append(
+            pd.read_sql(
+                query, conn, params=params, parse_dates=["Date", "ClosedTradeAt"]
+            )
+        )
 
-    query = f"""
-    SELECT
-        TradeId,
-        Date,
-        PremiumCaptured,
-        ClosingPremium,
-        (PremiumCaptured + ClosingPremium) AS PremiumKept,
-        ClosedTradeAt,
-        CloseReason
-    FROM {table_name};
-    """
+    if not frames:
+        return {}
 
-    df = pd.read_sql(query, conn)
-    conn.close()
-    return df
+    all_trades = pd.concat(frames, ignore_index=True)
+    # Trades are summarised by the year and month they were opened in
+    all_trades["Year"] = all_trades["Date"].dt.year
+    all_trades["Month"] = all_trades["Date"].dt.month
+    return {
+        table_name_key: trades.drop(columns="TableNameKey").reset_index(drop=True)
+        for table_name_key, trades in all_trades.groupby("TableNameKey", sort=False)
+    }
 
 
 def calculate_portfolio_metrics(df):
@@ -120,23 +184,24 @@ def calculate_portfolio_metrics(df):
 
     df["PremiumKept"] = pd.to_numeric(df["PremiumKept"], errors="coerce")
 
-    # Calculate win/loss metrics
-    winners = df[df["PremiumKept"] > 0]
-    losers = df[df["PremiumKept"] < 0]
+    # Calculate win/loss metrics, open trades have no premium kept and count as neither
+    premium_kept = df["PremiumKept"].to_numpy(dtype=np.float64)
+    winners = premium_kept[premium_kept > 0]
+    losers = premium_kept[premium_kept < 0]
     total_trades = len(df)
 
     # Win/Loss statistics
-    num_winners = len(winners)
-    num_losers = len(losers)
+    num_winners = winners.size
+    num_losers = losers.size
     win_rate = (num_winners / total_trades * 100) if total_trades > 0 else 0
     loss_rate = (num_losers / total_trades * 100) if total_trades > 0 else 0
 
-    avg_winner = float(winners["PremiumKept"].mean()) if len(winners) > 0 else 0
-    avg_loser = abs(float(losers["PremiumKept"].mean())) if len(losers) > 0 else 0
+    avg_winner = float(winners.mean()) if num_winners > 0 else 0
+    avg_loser = abs(float(losers.mean())) if num_losers > 0 else 0
 
     # Maximum winner and loser
-    max_winner = float(winners["PremiumKept"].max()) if len(winners) > 0 else 0
-    max_loser = abs(float(losers["PremiumKept"].min())) if len(losers) > 0 else 0
+    max_winner = float(winners.max()) if num_winners > 0 else 0
+    max_loser = abs(float(losers.min())) if num_losers > 0 else 0
 
     # Calculate Expectancy Ratio
     if avg_loser > 0:
@@ -147,11 +212,9 @@ def calculate_portfolio_metrics(df):
         expectancy_ratio = 0
 
     # Calculate total cumulative premium
-    total_premium = float(df["PremiumKept"].sum())
+    total_premium = float(np.nansum(premium_kept))
 
     # Calculate trade duration metrics
-    df["Date"] = pd.to_datetime(df["Date"])
-    df["ClosedTradeAt"] = pd.to_datetime(df["ClosedTradeAt"])
     df["TradeDuration"] = (df["ClosedTradeAt"] - df["Date"]).dt.days
 
     avg_duration = df["TradeDuration"].mean()
@@ -176,33 +239,23 @@ def calculate_portfolio_metrics(df):
 
 
 def analyze_win_loss_trades(df):
-    df["TotalPremium"] = df["PremiumCaptured"] + df["ClosingPremium"]
-    df["TradeResult"] = df["TotalPremium"].apply(lambda x: "Win" if x > 0 else "Loss")
-    df["Year"] = pd.to_datetime(df["Date"]).dt.year
-    df["Month"] = pd.to_datetime(df["Date"]).dt.month
-
-    yearly_analysis = {}
-
-    for year in df["Year"].unique():
-        year_data = df[df["Year"] == year]
-        monthly_stats = []
+    # Trades still open have no premium kept and are counted with the losses
+    df["IsWin"] = df["PremiumKept"] > 0
 
-        for month in range(1, 13):
-            month_data = year_data[year_data["Month"] == month]
-            winning_trades = month_data[month_data["TradeResult"] == "Win"]
-            losing_trades = month_data[month_data["TradeResult"] == "Loss"]
+    # Winning and losing trade counts for every month with trades, in a single pass
+    monthly_wins = df.groupby(["Year", "Month"])["IsWin"].agg(["sum", "size"])
 
-            if len(month_data) > 0:
-                monthly_stats.append(
-                    {
-                        "Month": pd.Timestamp(2024, month, 1).strftime("%B"),
-                        "Winning Trade Count": len(winning_trades),
-                        "Losing Trade Count": len(losing_trades),
-                    }
-                )
-
-        if monthly_stats:
-            yearly_analysis[year] = monthly_stats
+    yearly_analysis = {}
+    for (year, month), winning_trades, trades in zip(
+        monthly_wins.index, monthly_wins["sum"], monthly_wins["size"]
+    ):
+        yearly_analysis.setdefault(year, []).append(
+            {
+                "Month": MONTH_NAMES[month - 1],
+                "Winning Trade Count": int(winning_trades),
+                "Losing Trade Count": int(trades - winning_trades),
+            }
+        )
 
     return yearly_analysis
 
@@ -211,58 +264,42 @@ def calculate_monthly_win_rates_per_dte(dfs_dict):
     monthly_win_rates_dict = {}
 
     for dte, df in dfs_dict.items():
-        df = df.copy()
-        # Convert Date to datetime if it's not already
-        df["Date"] = pd.to_datetime(df["Date"])
-
-        # Add year and month columns
-        df["Year"] = df["Date"].dt.year
-        df["Month"] = df["Date"].dt.month
-
-        # Calculate premium difference
-        df["PremiumDiff"] = df["PremiumCaptured"] + df["ClosingPremium"]
-
-        # Group by year and month and calculate total premium difference
-        monthly_stats = (
-            df.groupby(["Year", "Month"])
-            .agg(premium_diff=("PremiumDiff", lambda x: f"${x.sum():.2f}"))
-            .reset_index()
+        # Total premium kept by year and month, and by year
+        monthly_premiums = df.groupby(["Year", "Month"])["PremiumKept"].sum()
+        yearly_premiums = df.groupby("Year")["PremiumKept"].sum()
+
+        # One row per year and one column per month, "-" for months never traded
+        formatted_table = (
+            monthly_premiums.map("${:.2f}".format)
+            .unstack("Month")
+            .reindex(columns=range(1, 13), fill_value="-")
         )
+        formatted_table.columns = MONTH_ABBREVIATIONS
+        formatted_table["Total"] = yearly_premiums.map("${:.2f}".format)
 
-        # Calculate yearly totals
-        yearly_totals = (
-            df.groupby("Year")
-            .agg(yearly_total=("PremiumDiff", lambda x: f"${x.sum():.2f}"))
-            .reset_index()
-        )
-
-        # Pivot the data to create the desired table format
-        stats_table = monthly_stats.pivot(
-            index="Year", columns="Month", values="premium_diff"
-        )
-
-        # Create a formatted table with premium differences
-        formatted_table = pd.DataFrame(index=stats_table.index)
-        for month in range(1, 13):
-            if month in stats_table.columns:
-                formatted_table[f"{pd.Timestamp(2024, month, 1).strftime('%b')}"] = (
-                    stats_table[month]
-                )
-            else:
-                formatted_table[f"{pd.Timestamp(2024, month, 1).strftime('%b')}"] = "-"
+        # Same table before formatting, NaN for the months without trades
+        premium_table = monthly_premiums.unstack("Month").reindex(columns=range(1, 13))
+        premium_table.columns = MONTH_ABBREVIATIONS
+        premium_table["Total"] = yearly_premiums
 
-        # Add yearly total column
-        formatted_table["Total"] = yearly_totals.set_index("Year")["yearly_total"]
-
-        monthly_win_rates_dict[dte] = formatted_table
+        monthly_win_rates_dict[dte] = formatted_table, premium_table
 
     return monthly_win_rates_dict
 
 
+@lru_cache(maxsize=None)
 def parse_strategy_params(raw_params):
     return dict(param.split("=") for param in raw_params.split(","))
 
 
+def backtest_runs_by_key(backtest_runs):
+    """First backtest run for every table name key"""
+    runs_by_key = {}
+    for run in backtest_runs:
+        runs_by_key.setdefault(run.table_name_key, run)
+    return runs_by_key
+
+
 def get_varying_strategy_params(backtest_runs):
     # Parse all parameter sets
     all_params = [parse_strategy_params(run.raw_params) for run in backtest_runs]
@@ -271,7 +308,7 @@ def get_varying_strategy_params(backtest_runs):
     varying_params = {}
     if all_params:
         param_keys = set().union(*[p.keys() for p in all_params])
-        excluded_keys = {"verbose", "db_path", "start_date", "end_date", "None"}
+        excluded_keys = NON_STRATEGY_PARAMS | {"None"}
 
         for key in param_keys - excluded_keys:
             values = {params.get(key) for params in all_params if key in params}
@@ -288,11 +325,10 @@ def add_metrics_to_figure(fig, metrics_dict, backtest_runs):
     varying_params = get_varying_strategy_params(backtest_runs)
 
     # Create parameters column
+    runs_by_key = backtest_runs_by_key(backtest_runs)
     params_list = []
     for idx in metrics_df.index:
-        backtest_run = next(
-            (run for run in backtest_runs if run.table_name_key == idx), None
-        )
+        backtest_run = runs_by_key.get(idx)
 
         if backtest_run:
             params = parse_strategy_params(backtest_run.raw_params)
@@ -337,34 +373,20 @@ def add_metrics_to_figure(fig, metrics_dict, backtest_runs):
     return fig
 
 
-def add_win_rates_to_figure(fig, win_rates_df, row_number):
-    # Function to determine cell color based on premium value
-    def get_cell_color(value):
-        if value == "-":
-            return "lavender"
-        # Remove "$" and convert to float
-        try:
-            amount = float(value.replace("$", ""))
-            if amount > 0:
-                # Green scale for positive values
-                intensity = min(
-                    abs(amount) / 1000, 1
-                )  # Adjust 1000 to change color intensity scaling
-                return f"rgba(0, 255, 0, {0.1 + intensity * 0.3})"
-            else:
-                # Red scale for negative values
-                intensity = min(
-                    abs(amount) / 1000, 1
-                )  # Adjust 1000 to change color intensity scaling
-                return f"rgba(255, 0, 0, {0.1 + intensity * 0.3})"
-        except:
-            return "lavender"
-
-    # Create cell colors for each column
-    cell_colors = []
-    for col in win_rates_df.columns:
-        col_colors = [get_cell_color(val) for val in win_rates_df[col]]
-        cell_colors.append(col_colors)
+def add_win_rates_to_figure(fig, win_rates_df, premium_table, row_number):
+    # Green for gains and red for losses, more opaque as the amount grows up to $1000
+    premiums = np.round(premium_table.to_numpy(dtype=np.float64), 2)
+    alphas = 0.1 + np.minimum(np.abs(premiums) / 1000, 1) * 0.3
+    prefixes = np.where(premiums > 0, "rgba(0, 255, 0, ", "rgba(255, 0, 0, ")
+    cell_colors = [
+        [
+            "lavender" if missing else f"{prefix}{alpha})"
+            for prefix, alpha, missing in zip(col_prefixes, col_alphas, col_missing)
+        ]
+        for col_prefixes, col_alphas, col_missing in zip(
+            prefixes.T.tolist(), alphas.T.tolist(), np.isnan(premiums).T.tolist()
+        )
+    ]
 
     fig.add_trace(
         go.Table(
@@ -405,13 +427,15 @@ def plot_equity_graph(fig, dfs_dict):
     ]
 
     for i, (table_name_key, df) in enumerate(dfs_dict.items()):
-        df["Date"] = pd.to_datetime(df["Date"])
-        df["CumulativePremiumKept"] = df["PremiumKept"].cumsum()
+        # Trades still open have no premium kept and are left out of the line
+        premium_kept = df["PremiumKept"].to_numpy(dtype=np.float64)
+        cumulative_premium_kept = np.nancumsum(premium_kept)
+        cumulative_premium_kept[np.isnan(premium_kept)] = np.nan
 
         fig.add_trace(
-            go.Scatter(
-                x=df["Date"],
-                y=df["CumulativePremiumKept"],
+            go.Scattergl(
+                x=df["Date"].to_numpy(),
+                y=cumulative_premium_kept,
                 mode="lines+markers",
                 name=table_name_key,
                 line=dict(color=color_cycle[i % len(color_cycle)]),
@@ -456,12 +480,11 @@ def generate_report(
     metrics_dict = {}
     win_loss_analysis_dict = {}
 
-    for row in backtest_runs:
-        df = fetch_data(db_path, row.trade_table_name)
-        if not df.empty:
-            dfs_dict[row.table_name_key] = df
-            metrics_dict[row.table_name_key] = calculate_portfolio_metrics(df)
-            win_loss_analysis_dict[row.table_name_key] = analyze_win_loss_trades(df)
+    # Runs without any trades are left out by the grouping
+    for table_name_key, df in fetch_all_data(db_path, backtest_runs).items():
+        dfs_dict[table_name_key] = df
+        metrics_dict[table_name_key] = calculate_portfolio_metrics(df)
+        win_loss_analysis_dict[table_name_key] = analyze_win_loss_trades(df)
 
     if not dfs_dict:
         logging.warning("No data found in any of the tables.")
@@ -494,16 +517,15 @@ def generate_report(
         f"<span style='font-size:10px'>Equity Graph</span>",
         f"<span style='font-size:10px'>Performance Metrics by DTE</span>",
     ]
+    runs_by_key = backtest_runs_by_key(backtest_runs)
     for table_name_key in sorted(dfs_dict.keys()):
-        backtest_run_row = next(
-            (row for row in backtest_runs if row.table_name_key == table_name_key), None
-        )
+        backtest_run_row = runs_by_key[table_name_key]
 
         # Convert raw_params to a dictionary
         raw_params_dict = {
             k: v
-            for k, v in (x.split("=") for x in backtest_run_row.raw_params.split(","))
-            if k not in ("verbose", "db_path", "start_date", "end_date") and v != "None"
+            for k, v in parse_strategy_params(backtest_run_row.raw_params).items()
+            if k not in NON_STRATEGY_PARAMS and v != "None"
         }
         params = ", ".join(f"{k}={v}" for k, v in raw_params_dict.items())
 
@@ -533,7 +555,8 @@ def generate_report(
     table_row = 3
     for dte in sorted(dfs_dict.keys()):
         # Add monthly win rates table
-        fig = add_win_rates_to_figure(fig, monthly_win_rates_dict[dte], table_row)
+        win_rates_df, premium_table = monthly_win_rates_dict[dte]
+        fig = add_win_rates_to_figure(fig, win_rates_df, premium_table, table_row)
 
         # Bar chart goes in the next row
         bar_row = table_row + 1
@@ -599,10 +622,10 @@ def generate_report(
 def _fetch_backtest_run_rows(
     db_path, strategy_name, start_datetime=None, end_datetime=None
 ):
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-
-    query = "SELECT * FROM backtest_runs WHERE Strategy=?"
+    query = """
+    SELECT RunId, DateTime, Strategy, RawParams, TableNameKey, TradeTableName, TradeLegsTableName
+    FROM backtest_runs
+    WHERE Strategy=?"""
     params = [strategy_name]
 
     if start_datetime:
@@ -615,12 +638,8 @@ def _fetch_backtest_run_rows(
         query += " AND DateTime <= ?"
         params.append(str(end_dt))
 
-    cursor.execute(query, params)
-    rows = cursor.fetchall()
-    result = []
-    for row in rows:
-        result.append(BacktestRun(*row))
-    return result
+    rows = _open_db(db_path).execute(query, params).fetchall()
+    return list(map(BacktestRun._make, rows))
 
 
 def validate_datetime(datetime_str):
@@ -691,9 +710,8 @@ def main():
         return
 
     if args.output:
-        html_content = create_html_output(fig)
         with open(args.output, "w", encoding="utf-8") as f:
-            f.write(html_content)
+            write_html_output(fig, f)
         print(f"\nEquity graph and metrics saved to: {args.output}")
     else:
         fig.show()
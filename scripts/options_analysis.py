@@ -1,13 +1,19 @@
 import argparse
 import dataclasses
+import functools
+import inspect
 import logging
+import os
 import sqlite3
 from abc import abstractmethod
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass, field
 from datetime import date, datetime
 from enum import Enum
+from itertools import product, repeat
 from typing import Dict, List, Optional, Tuple
 
+import numpy as np
 import pandas as pd
 
 
@@ -35,6 +41,16 @@ def calculate_date_difference(
         )
 
 
+@functools.lru_cache(maxsize=None)
+def parse_date(date_str) -> date:
+    """Quote, trade and expiry dates repeat across a backtest, so each one is only parsed once"""
+    return date.fromisoformat(date_str)
+
+
+def days_between(start_date_str, end_date_str) -> int:
+    return (parse_date(end_date_str) - parse_date(start_date_str)).days
+
+
 class ContractType(Enum):
     CALL = "Call"
     PUT = "Put"
@@ -51,7 +67,7 @@ class LegType(Enum):
     TRADE_CLOSE = "TradeClose"
 
 
-@dataclass
+@dataclass(slots=True)
 class Leg:
     """Represents a single leg of a trade (call or put)."""
 
@@ -124,7 +140,7 @@ class Leg:
         return "".join(leg_str)
 
 
-@dataclass
+@dataclass(slots=True)
 class Trade:
     """Represents a trade."""
 
@@ -178,7 +194,8 @@ class Trade:
         return trade_str
 
 
-@dataclass
+# Frozen as looked up contracts are shared through the options lookup cache
+@dataclass(slots=True, frozen=True)
 class OptionsData:
     quote_unixtime: int
     quote_readtime: str
@@ -214,6 +231,81 @@ class OptionsData:
     strike_distance: float
     strike_distance_pct: float
 
+    def contract_values(
+        self, contract_type: ContractType
+    ) -> Tuple[float, float, float, float, float, float]:
+        """Returns (last, delta, gamma, vega, theta, iv) for the given contract type"""
+        if contract_type is ContractType.PUT:
+            return (
+                self.p_last,
+                self.p_delta,
+                self.p_gamma,
+                self.p_vega,
+                self.p_theta,
+                self.p_iv,
+            )
+        return (
+            self.c_last,
+            self.c_delta,
+            self.c_gamma,
+            self.c_vega,
+            self.c_theta,
+            self.c_iv,
+        )
+
+
+def build_open_leg(
+    od: OptionsData,
+    quote_date,
+    expiry_date,
+    position_type: PositionType,
+    contract_type: ContractType,
+) -> Leg:
+    """Build the leg opening a position in the given contract"""
+    premium, delta, gamma, vega, theta, iv = od.contract_values(contract_type)
+    return Leg(
+        leg_quote_date=quote_date,
+        leg_expiry_date=expiry_date,
+        leg_type=LegType.TRADE_OPEN,
+        position_type=position_type,
+        contract_type=contract_type,
+        strike_price=od.strike,
+        underlying_price_open=od.underlying_last,
+        premium_open=premium,
+        premium_current=0,
+        delta=delta,
+        gamma=gamma,
+        vega=vega,
+        theta=theta,
+        iv=iv,
+    )
+
+
+# SQLite builds before 3.32 allow 999 bound parameters, each contract takes two
+MAX_CONTRACTS_PER_QUERY = 499
+
+
+def cache_options_lookup(method):
+    """
+    Memoize an options data lookup by its arguments. Options data does not change
+    during a backtest, so results are kept until the database reconnects
+    """
+    signature = inspect.signature(method)
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        # Keyword and default arguments are bound to their positions so that every way
+        # of calling the lookup shares the same key as the preloaded results
+        bound = signature.bind(self, *args, **kwargs)
+        bound.apply_defaults()
+        lookup_args = bound.args[1:]
+        key = (method.__name__, *lookup_args)
+        if key not in self.options_lookups:
+            self.options_lookups[key] = method(self, *lookup_args)
+        return self.options_lookups[key]
+
+    return wrapper
+
 
 class OptionsDatabase:
     def __init__(self, db_path, strategy_name, table_name_key=None):
@@ -224,6 +316,7 @@ class OptionsDatabase:
         logging.info(f"Strategy Key {self.table_tag}")
         self.trades_table = f"trades_{strategy_name}_{self.table_tag}"
         self.trade_legs_table = f"trade_legs_{strategy_name}_{self.table_tag}"
+        self.options_lookups = {}
 
     def __enter__(self) -> "OptionsDatabase":
         """Context manager entry point - connects to database"""
@@ -237,8 +330,19 @@ class OptionsDatabase:
     def connect(self):
         """Establish database connection"""
         logging.info(f"Connecting to database: {self.db_path}")
-        self.conn = sqlite3.connect(self.db_path)
+        self.options_lookups = {}
+        # Parameter sweeps write to the same database file from multiple processes.
+        # Queries are reused as prepared statements, the larger cache leaves room for the
+        # leg price queries whose text changes with the number of open contracts
+        self.conn = sqlite3.connect(self.db_path, timeout=60, cached_statements=512)
         self.cursor = self.conn.cursor()
+        # WAL with NORMAL sync avoids an fsync on every commit
+        self.cursor.execute("PRAGMA journal_mode=WAL")
+        self.cursor.execute("PRAGMA synchronous=NORMAL")
+        # Keep the options_data working set and temporary sort tables in memory
+        self.cursor.execute("PRAGMA mmap_size=1073741824")
+        self.cursor.execute("PRAGMA cache_size=-262144")
+        self.cursor.execute("PRAGMA temp_store=MEMORY")
 
     def disconnect(self):
         """Close database connection"""
@@ -329,19 +433,12 @@ class OptionsDatabase:
         """
         self.cursor.execute(create_table_sql)
         self.cursor.execute(create_trade_legs_table_sql)
+        self.cursor.execute(
+            f"CREATE INDEX IF NOT EXISTS idx_{self.trades_table}_status ON {self.trades_table}(Status)"
+        )
         logging.info("Tables dropped and recreated successfully")
 
-        # Add indexes for options_data table
-        index_sql = [
-            "CREATE INDEX IF NOT EXISTS idx_options_quote_date ON options_data(QUOTE_DATE)",
-            "CREATE INDEX IF NOT EXISTS idx_options_expire_date ON options_data(EXPIRE_DATE)",
-            "CREATE INDEX IF NOT EXISTS idx_options_combined ON options_data(QUOTE_DATE, EXPIRE_DATE)",
-        ]
-
-        for sql in index_sql:
-            self.cursor.execute(sql)
-
-        logging.info("Added indexes successfully")
+        self.setup_options_data_indexes()
 
         # Create the backtest_runs table
         create_backtest_runs_table_sql = """
@@ -358,6 +455,21 @@ class OptionsDatabase:
         self.cursor.execute(create_backtest_runs_table_sql)
         self.conn.commit()
 
+    def setup_options_data_indexes(self):
+        """Add indexes for options_data table"""
+        index_sql = [
+            "CREATE INDEX IF NOT EXISTS idx_options_quote_date ON options_data(QUOTE_DATE)",
+            "CREATE INDEX IF NOT EXISTS idx_options_expire_date ON options_data(EXPIRE_DATE)",
+            "CREATE INDEX IF NOT EXISTS idx_options_combined ON options_data(QUOTE_DATE, EXPIRE_DATE)",
+            "CREATE INDEX IF NOT EXISTS idx_options_quote_expire_strike ON options_data(QUOTE_DATE, EXPIRE_DATE, STRIKE)",
+        ]
+
+        for sql in index_sql:
+            self.cursor.execute(sql)
+        self.conn.commit()
+
+        logging.info("Added indexes successfully")
+
     def record_backtest_run(self, strategy_name: str, test_args: argparse.Namespace):
         backtest_run_sql = f"""
         INSERT INTO backtest_runs (
@@ -365,8 +477,11 @@ class OptionsDatabase:
         ) VALUES (?, ?, ?, ?, ?, ?)
         """
 
+        # Table name key is already recorded in its own column
         raw_params = ",".join(
-            f"{key}={value}" for key, value in vars(test_args).items()
+            f"{key}={value}"
+            for key, value in vars(test_args).items()
+            if key != "table_name_key"
         )
 
         params = (
@@ -381,8 +496,12 @@ class OptionsDatabase:
         self.cursor.execute(backtest_run_sql, params)
         self.conn.commit()
 
-    def update_trade_leg(self, existing_trade_id, updated_leg: Leg):
-        update_leg_sql = f"""
+    def insert_trade_legs(self, trade_id, legs: List[Leg]):
+        self.insert_legs((trade_id, leg) for leg in legs)
+
+    def insert_legs(self, trade_legs):
+        """Insert (trade id, leg) pairs with a single executemany"""
+        insert_legs_sql = f"""
         INSERT INTO {self.trade_legs_table} (
             TradeId, Date, ExpiryDate, StrikePrice, ContractType, PositionType, LegType,
             PremiumOpen, PremiumCurrent, UnderlyingPriceOpen, UnderlyingPriceCurrent,
@@ -390,31 +509,41 @@ class OptionsDatabase:
         ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         """
 
-        params = (
-            existing_trade_id,
-            updated_leg.leg_quote_date,
-            updated_leg.leg_expiry_date,
-            updated_leg.strike_price,
-            updated_leg.contract_type.value,
-            updated_leg.position_type.value,
-            updated_leg.leg_type.value,
-            updated_leg.premium_open,
-            updated_leg.premium_current,
-            updated_leg.underlying_price_open,
-            updated_leg.underlying_price_current,
-            updated_leg.delta,
-            updated_leg.gamma,
-            updated_leg.vega,
-            updated_leg.theta,
-            updated_leg.iv,
+        # Rows are streamed to executemany rather than collected into a list first
+        legs_params = (
+            (
+                trade_id,
+                leg.leg_quote_date,
+                leg.leg_expiry_date,
+                leg.strike_price,
+                leg.contract_type.value,
+                leg.position_type.value,
+                leg.leg_type.value,
+                leg.premium_open,
+                leg.premium_current,
+                leg.underlying_price_open,
+                leg.underlying_price_current,
+                leg.delta,
+                leg.gamma,
+                leg.vega,
+                leg.theta,
+                leg.iv,
+            )
+            for trade_id, leg in trade_legs
         )
 
-        logging.debug(f"update_trade_leg query:\n{update_leg_sql} ({params})")
+        logging.debug("insert_legs query:\n%s", insert_legs_sql)
+
+        self.cursor.executemany(insert_legs_sql, legs_params)
 
-        self.cursor.execute(update_leg_sql, params)
+    def update_trade_leg(self, existing_trade_id, updated_leg: Leg):
+        self.insert_trade_legs(existing_trade_id, [updated_leg])
         self.conn.commit()
 
     def update_trade_with_multiple_legs(self, existing_trade: Trade):
+        self.update_trades_with_multiple_legs([existing_trade])
+
+    def update_trades_with_multiple_legs(self, existing_trades: List[Trade]):
         update_trade_sql = f"""
         UPDATE {self.trades_table}
         SET Date = ?,
@@ -428,23 +557,27 @@ class OptionsDatabase:
         WHERE TradeId = ?
         """
 
-        trade_params = (
-            existing_trade.trade_date,
-            existing_trade.expire_date,
-            existing_trade.dte,
-            existing_trade.status,
-            existing_trade.premium_captured,
-            existing_trade.closing_premium,
-            existing_trade.closed_trade_at,
-            existing_trade.close_reason,
-            existing_trade.id,
-        )
-
-        self.cursor.execute(update_trade_sql, trade_params)
-        self.conn.commit()
+        trades_params = [
+            (
+                existing_trade.trade_date,
+                existing_trade.expire_date,
+                existing_trade.dte,
+                existing_trade.status,
+                existing_trade.premium_captured,
+                existing_trade.closing_premium,
+                existing_trade.closed_trade_at,
+                existing_trade.close_reason,
+                existing_trade.id,
+            )
+            for existing_trade in existing_trades
+        ]
 
-        for leg in existing_trade.legs:
-            self.update_trade_leg(existing_trade.id, leg)
+        self.cursor.executemany(update_trade_sql, trades_params)
+        self.insert_legs(
+            (existing_trade.id, leg)
+            for existing_trade in existing_trades
+            for leg in existing_trade.legs
+        )
 
     def create_trade_with_multiple_legs(self, trade):
         trade_sql = f"""
@@ -467,36 +600,7 @@ class OptionsDatabase:
         self.cursor.execute(trade_sql, trade_params)
         trade_id = self.cursor.lastrowid
 
-        leg_sql = f"""
-        INSERT INTO {self.trade_legs_table} (
-            TradeId, Date, ExpiryDate, StrikePrice, ContractType, PositionType, LegType,
-            PremiumOpen, PremiumCurrent, UnderlyingPriceOpen, UnderlyingPriceCurrent,
-            Delta, Gamma, Vega, Theta, Iv
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """
-
-        for leg in trade.legs:
-            leg_params = (
-                trade_id,
-                leg.leg_quote_date,
-                leg.leg_expiry_date,
-                leg.strike_price,
-                leg.contract_type.value,
-                leg.position_type.value,
-                leg.leg_type.value,
-                leg.premium_open,
-                leg.premium_current,
-                leg.underlying_price_open,
-                leg.underlying_price_current,
-                leg.delta,
-                leg.gamma,
-                leg.vega,
-                leg.theta,
-                leg.iv,
-            )
-            self.cursor.execute(leg_sql, leg_params)
-
-        self.conn.commit()
+        self.insert_trade_legs(trade_id, trade.legs)
         return trade_id
 
     def load_trade_with_multiple_legs(
@@ -519,13 +623,18 @@ class OptionsDatabase:
         return self.build_trade_from(trade_row, trade_legs)
 
     def update_trade_legs(
-        self, existing_trade_legs, quote_date
+        self, existing_trade_legs, quote_date, current_options_data=None
     ) -> List[Dict[str, Leg]]:
+        if current_options_data is None:
+            current_options_data = self.get_current_options_data_for_legs(
+                quote_date, existing_trade_legs
+            )
+
         updated_legs = []
         for leg in existing_trade_legs:
             updates = {}
-            od: OptionsData = self.get_current_options_data(
-                quote_date, leg.strike_price, leg.leg_expiry_date
+            od: OptionsData = current_options_data.get(
+                (leg.strike_price, leg.leg_expiry_date)
             )
 
             error_message, bad_data_found = bad_options_data(quote_date, od)
@@ -533,6 +642,9 @@ class OptionsDatabase:
                 logging.warning(error_message)
                 continue
 
+            premium_current, delta, gamma, vega, theta, iv = od.contract_values(
+                leg.contract_type
+            )
             updated_leg = Leg(
                 historyId=leg.historyId,
                 leg_quote_date=quote_date,
@@ -543,24 +655,19 @@ class OptionsDatabase:
                 underlying_price_open=leg.underlying_price_open,
                 premium_open=leg.premium_open,
                 underlying_price_current=od.underlying_last,
-                premium_current=od.p_last
-                if leg.contract_type is ContractType.PUT
-                else od.c_last,
+                premium_current=premium_current,
                 leg_type=leg.leg_type,
-                delta=od.p_delta
-                if leg.contract_type is ContractType.PUT
-                else od.c_delta,
-                gamma=od.p_gamma
-                if leg.contract_type is ContractType.PUT
-                else od.c_gamma,
-                vega=od.p_vega if leg.contract_type is ContractType.PUT else od.c_vega,
-                theta=od.p_theta
-                if leg.contract_type is ContractType.PUT
-                else od.c_theta,
-                iv=od.p_iv if leg.contract_type is ContractType.PUT else od.c_iv,
+                delta=delta,
+                gamma=gamma,
+                vega=vega,
+                theta=theta,
+                iv=iv,
             )
             logging.debug(
-                f"Updating leg {leg.position_type.value} {leg.contract_type.value} -> {updated_leg.premium_current}"
+                "Updating leg %s %s -> %s",
+                leg.position_type.value,
+                leg.contract_type.value,
+                updated_leg.premium_current,
             )
             updates["current"] = leg
             updates["updated"] = updated_leg
@@ -615,7 +722,10 @@ class OptionsDatabase:
         return trades
 
     def close_trade(self, existing_trade_id, existing_trade: Trade):
-        # Update the trade record
+        self.close_trades([dataclasses.replace(existing_trade, id=existing_trade_id)])
+
+    def close_trades(self, existing_trades: List[Trade]):
+        # Update the trade records
         update_trade_sql = f"""
         UPDATE {self.trades_table}
         SET Status = ?,
@@ -625,16 +735,18 @@ class OptionsDatabase:
         WHERE TradeId = ?
         """
 
-        trade_params = (
-            "CLOSED",
-            existing_trade.closing_premium,
-            existing_trade.closed_trade_at,
-            existing_trade.close_reason,
-            existing_trade_id,
-        )
+        trades_params = [
+            (
+                "CLOSED",
+                existing_trade.closing_premium,
+                existing_trade.closed_trade_at,
+                existing_trade.close_reason,
+                existing_trade.id,
+            )
+            for existing_trade in existing_trades
+        ]
 
-        self.cursor.execute(update_trade_sql, trade_params)
-        self.conn.commit()
+        self.cursor.executemany(update_trade_sql, trades_params)
 
     def get_open_trades(self):
         """Get all open trades"""
@@ -645,6 +757,26 @@ class OptionsDatabase:
             """
         return pd.read_sql_query(query, self.conn)
 
+    def iter_open_trades(self):
+        """Yield (TradeId, ExpireDate) of all open trades"""
+        query = f"""
+            SELECT TradeId, ExpireDate
+            FROM {self.trades_table}
+            WHERE Status = 'OPEN'
+            """
+        # Fetch everything up front as trades are updated while iterating
+        yield from self.conn.execute(query).fetchall()
+
+    def get_last_open_trade_date(self) -> Optional[str]:
+        query = f"""
+            SELECT Date
+            FROM {self.trades_table}
+            WHERE Status = 'OPEN'
+            ORDER BY DATE DESC LIMIT 1;
+        """
+        row = self.conn.execute(query).fetchone()
+        return row[0] if row else None
+
     def get_last_open_trade(self):
         query = f"""
             SELECT *
@@ -668,7 +800,12 @@ class OptionsDatabase:
         self.cursor.execute(query, (quote_date, strike_price, expire_date))
         result = self.cursor.fetchone()
         logging.debug(
-            f"get_current_prices query:\n{query} ({quote_date}, {strike_price}, {expire_date}) => {result}"
+            "get_current_prices query:\n%s (%s, %s, %s) => %s",
+            query,
+            quote_date,
+            strike_price,
+            expire_date,
+            result,
         )
 
         if result is None:
@@ -676,6 +813,37 @@ class OptionsDatabase:
 
         return OptionsData(*result)
 
+    def get_current_options_data_for_legs(
+        self, quote_date: str, legs: List[Leg]
+    ) -> Dict[Tuple[float, str], OptionsData]:
+        """Get current prices for all the legs in a single query, keyed by (strike, expiration)"""
+        contracts = list(
+            dict.fromkeys((leg.strike_price, leg.leg_expiry_date) for leg in legs)
+        )
+        if not contracts:
+            return {}
+
+        current_options_data = {}
+        # Stay within the bound parameter limit of older SQLite builds
+        for start in range(0, len(contracts), MAX_CONTRACTS_PER_QUERY):
+            chunk = contracts[start : start + MAX_CONTRACTS_PER_QUERY]
+            query = f"""
+                SELECT *
+                FROM options_data
+                WHERE QUOTE_DATE = ?
+                AND (STRIKE, EXPIRE_DATE) IN (VALUES {", ".join(["(?, ?)"] * len(chunk))})
+                """
+            params = [quote_date] + [value for contract in chunk for value in contract]
+            self.cursor.execute(query, params)
+
+            for row in self.cursor.fetchall():
+                od = OptionsData(*row)
+                current_options_data.setdefault((od.strike, od.expire_date), od)
+        logging.debug(
+            f"Found options data for {len(current_options_data)} of {len(contracts)} contracts on {quote_date}"
+        )
+        return current_options_data
+
     def get_quote_dates(self, start_date=None, end_date=None):
         """Get all unique quote dates"""
         if start_date is None or end_date is None:
@@ -687,6 +855,7 @@ class OptionsDatabase:
         logging.debug(f"Found {len(dates)} unique quote dates")
         return dates
 
+    @cache_options_lookup
     def get_next_expiry_by_dte(self, quote_date, min_dte):
         """
         Get the next expiration date where DTE is greater than the specified number of days
@@ -715,6 +884,44 @@ class OptionsDatabase:
             logging.debug(f"No expiration found with DTE > {min_dte} from {quote_date}")
             return None
 
+    def preload_next_expiries(self, quote_dates, min_dte):
+        """
+        Find the next expiration for all quote dates in a single query
+        so that get_next_expiry_by_dte does not hit the database for every quote date
+        """
+        if not quote_dates:
+            return
+
+        # SQLite takes DTE from the row holding MIN(EXPIRE_DATE)
+        query = """
+        SELECT QUOTE_DATE, MIN(EXPIRE_DATE), DTE
+        FROM options_data
+        WHERE DTE >= ?
+        AND QUOTE_DATE BETWEEN ? AND ?
+        GROUP BY QUOTE_DATE
+        """
+        self.cursor.execute(query, (min_dte, quote_dates[0], quote_dates[-1]))
+        next_expiries = {
+            quote_date: (expire_date, dte)
+            for quote_date, expire_date, dte in self.cursor.fetchall()
+        }
+        self.cache_next_expiries(quote_dates, min_dte, next_expiries)
+
+    def seed_lookup_cache(self, lookup_name, args, result):
+        self.options_lookups[(lookup_name, *args)] = result
+
+    def cache_next_expiries(self, quote_dates, min_dte, next_expiries):
+        for quote_date in quote_dates:
+            self.seed_lookup_cache(
+                "get_next_expiry_by_dte",
+                (quote_date, min_dte),
+                next_expiries.get(quote_date),
+            )
+        logging.debug(
+            f"Preloaded next expiries with DTE >= {min_dte} for {len(quote_dates)} quote dates"
+        )
+
+    @cache_options_lookup
     def get_options_data_closest_to_price(
         self, quote_date, expiry_date
     ) -> Optional[OptionsData]:
@@ -724,16 +931,21 @@ class OptionsDatabase:
         FROM options_data
         WHERE QUOTE_DATE = ?
         AND EXPIRE_DATE = ?
-        ORDER BY STRIKE_DISTANCE ASC
+        ORDER BY STRIKE_DISTANCE ASC, STRIKE ASC
         LIMIT 1
         """
         self.cursor.execute(query, (quote_date, expiry_date))
         result = self.cursor.fetchone()
         logging.debug(
-            f"get_current_prices query:\n{query} ({quote_date}, {expiry_date}) => {result}"
+            "get_current_prices query:\n%s (%s, %s) => %s",
+            query,
+            quote_date,
+            expiry_date,
+            result,
         )
         return None if not result else OptionsData(*result)
 
+    @cache_options_lookup
     def get_options_by_delta(
         self,
         contract_type: ContractType,
@@ -752,25 +964,133 @@ class OptionsDatabase:
         query = f"""
             SELECT * FROM options_data
             WHERE QUOTE_DATE = ? AND EXPIRE_DATE = ?
-            ORDER BY ABS({delta_column} * ? - ?)
+            ORDER BY ABS({delta_column} * ? - ?), STRIKE
             LIMIT 1
         """
         params = (quote_date, expiry_date, delta_sign, required_delta)
-        logging.debug(f"Executing query:\n{query} -> {params}")
+        logging.debug("Executing query:\n%s -> %s", query, params)
         self.cursor.execute(query, params)
         result = self.cursor.fetchone()
 
         # Convert the result into an OptionsData object or similar structure
-        if result:
-            return OptionsData(*result)
+        return None if not result else OptionsData(*result)
+
+    def next_expiry_options(
+        self, quote_dates, min_dte, order_by, order_params=()
+    ) -> List[OptionsData]:
+        """
+        Pick one option per quote date at the next expiry (DTE >= min_dte) in a single query.
+        Options are ranked by the order_by expression on options_data aliased as o
+        """
+        query = f"""
+        WITH next_expiry AS (
+            SELECT QUOTE_DATE, MIN(EXPIRE_DATE) AS EXPIRE_DATE
+            FROM options_data
+            WHERE DTE >= ?
+            AND QUOTE_DATE BETWEEN ? AND ?
+            GROUP BY QUOTE_DATE
+        )
+        SELECT * FROM (
+            SELECT o.*, ROW_NUMBER() OVER (
+                PARTITION BY o.QUOTE_DATE
+                ORDER BY {order_by}, o.STRIKE
+            ) AS OPTION_RANK
+            FROM options_data o
+            JOIN next_expiry n
+            ON o.QUOTE_DATE = n.QUOTE_DATE AND o.EXPIRE_DATE = n.EXPIRE_DATE
+        )
+        WHERE OPTION_RANK = 1
+        """
+        params = (min_dte, quote_dates[0], quote_dates[-1], *order_params)
+        self.cursor.execute(query, params)
+        return [OptionsData(*row[:-1]) for row in self.cursor.fetchall()]
+
+    def preload_options_by_delta(
+        self,
+        contract_type: ContractType,
+        position_type: PositionType,
+        quote_dates,
+        min_dte,
+        required_delta,
+    ):
+        """
+        Pick the option closest to the required delta at the next expiry (DTE >= min_dte)
+        for all quote dates, so get_options_by_delta is served from the cache
+        """
+        if not quote_dates:
+            return
+
+        delta_column = "C_DELTA" if contract_type == ContractType.CALL else "P_DELTA"
+        delta_sign = 1 if position_type == PositionType.LONG else -1
+
+        options = self.next_expiry_options(
+            quote_dates,
+            min_dte,
+            f"ABS(o.{delta_column} * ? - ?)",
+            (delta_sign, required_delta),
+        )
+        self.cache_options_by_delta(
+            contract_type, position_type, required_delta, options
+        )
+
+    def preload_options_closest_to_price(self, quote_dates, min_dte):
+        """
+        Pick the option closest to the underlying price at the next expiry (DTE >= min_dte)
+        for all quote dates, so get_options_data_closest_to_price is served from the cache
+        """
+        if not quote_dates:
+            return
+
+        options = self.next_expiry_options(quote_dates, min_dte, "o.STRIKE_DISTANCE")
+        self.cache_options_closest_to_price(options)
 
-        return None
+    def cache_options_closest_to_price(self, options: List[OptionsData]):
+        for od in options:
+            self.seed_lookup_cache(
+                "get_options_data_closest_to_price", (od.quote_date, od.expire_date), od
+            )
+        logging.debug(
+            f"Preloaded options closest to price for {len(options)} quote dates"
+        )
+
+    def cache_options_by_delta(
+        self, contract_type, position_type, required_delta, options: List[OptionsData]
+    ):
+        for od in options:
+            self.seed_lookup_cache(
+                "get_options_by_delta",
+                (
+                    contract_type,
+                    position_type,
+                    od.quote_date,
+                    od.expire_date,
+                    required_delta,
+                ),
+                od,
+            )
+        logging.debug(
+            f"Preloaded {contract_type.value} options closest to {required_delta} delta for {len(options)} quote dates"
+        )
 
     def trade_legs_from_db(self, trade_id, leg_type=None):
         leg_rows = self.leg_rows_from_db(trade_id, leg_type)
         return [self.build_leg_from_row(leg_row) for leg_row in leg_rows]
 
 
+def open_options_database(args, strategy_name, table_name_key=None):
+    if getattr(args, "backend", "sqlite") == "arrow":
+        if not args.parquet_path:
+            raise ValueError("--parquet-path is required when using the arrow backend")
+        # pyarrow is only needed when reading options data from Parquet
+        from options_parquet import ArrowOptionsDatabase
+
+        return ArrowOptionsDatabase(
+            args.db_path, args.parquet_path, strategy_name, table_name_key
+        )
+
+    return OptionsDatabase(args.db_path, strategy_name, table_name_key)
+
+
 # Options Strategy Runner Framework
 
 
@@ -782,12 +1102,12 @@ class DataForTradeManagement:
     profit_take: float
     stop_loss: float
     quote_date: str
+    open_trade_count: int = 0
 
 
 def check_profit_take_stop_loss_targets(
-    profit_take, stop_loss, existing_trade_premium_captured, updated_legs
+    profit_take, stop_loss, existing_trade_premium_captured, current_premium_value
 ):
-    current_premium_value = round(sum(l.premium_current for l in updated_legs), 2)
     total_premium_received = (
         existing_trade_premium_captured + 0.001
         if existing_trade_premium_captured == 0
@@ -803,14 +1123,34 @@ def check_profit_take_stop_loss_targets(
     return "UNKNOWN", False
 
 
+def profit_take_stop_loss_targets(
+    profit_take, stop_loss, trade_premiums_captured, current_premium_values
+) -> List[Tuple[str, bool]]:
+    """Same as check_profit_take_stop_loss_targets for a list of trades in one go"""
+    total_premium_received = np.asarray(trade_premiums_captured, dtype=float)
+    # to avoid divide by zero error
+    total_premium_received[total_premium_received == 0] = 0.001
+    premium_diff = total_premium_received - np.asarray(
+        current_premium_values, dtype=float
+    )
+    premium_diff_pct = (premium_diff / total_premium_received) * 100
+
+    no_target = np.zeros(len(premium_diff_pct), dtype=bool)
+    profit_take_hit = premium_diff_pct >= profit_take if profit_take else no_target
+    stop_loss_hit = premium_diff_pct <= -stop_loss if stop_loss else no_target
+    close_reasons = np.where(
+        profit_take_hit,
+        "PROFIT_TAKE",
+        np.where(stop_loss_hit, "STOP_LOSS", "UNKNOWN"),
+    )
+    return list(zip(close_reasons.tolist(), (profit_take_hit | stop_loss_hit).tolist()))
+
+
 def bad_options_data(quote_date, od: OptionsData) -> Tuple[str, bool]:
     if not od:
         return f"⚠️ Unable to find options data for {quote_date=}", True
 
-    if any(
-        price is None or price == 0
-        for price in (od.underlying_last, od.c_last, od.p_last)
-    ):
+    if not od.underlying_last or not od.c_last or not od.p_last:
         return (
             f"⚠️ Bad data found on {quote_date}. One of {od.underlying_last=}, {od.c_last=}, {od.p_last=} is missing",
             True,
@@ -818,9 +1158,8 @@ def bad_options_data(quote_date, od: OptionsData) -> Tuple[str, bool]:
     return "", False
 
 
-def within_max_open_trades(options_db, max_open_trades):
-    open_trades = options_db.get_open_trades()
-    if len(open_trades) >= max_open_trades:
+def within_max_open_trades(open_trade_count, max_open_trades):
+    if open_trade_count >= max_open_trades:
         logging.debug(
             f"Maximum number of open trades ({max_open_trades}) reached. Skipping new trade creation."
         )
@@ -834,18 +1173,13 @@ def passed_trade_delay(options_db, quote_date, trade_delay):
     if trade_delay is None:
         return True
 
-    last_open_trade = options_db.get_last_open_trade()
+    last_trade_date = options_db.get_last_open_trade_date()
 
-    if last_open_trade.empty:
+    if last_trade_date is None:
         logging.debug("No open trades found. Can create new trade.")
         return True
 
-    last_trade_date = last_open_trade["Date"].iloc[0]
-
-    last_trade_date = datetime.strptime(last_trade_date, "%Y-%m-%d").date()
-    quote_date = datetime.strptime(quote_date, "%Y-%m-%d").date()
-
-    days_since_last_trade = (quote_date - last_trade_date).days
+    days_since_last_trade = days_between(last_trade_date, quote_date)
 
     if days_since_last_trade >= trade_delay:
         logging.info(
@@ -911,6 +1245,95 @@ def add_standard_cli_arguments(parser):
         type=float,
         help="Close position when loss reaches this percentage of premium received",
     )
+    parser.add_argument(
+        "--backend",
+        choices=["sqlite", "arrow"],
+        default="sqlite",
+        help="Read options data from the SQLite database or a Parquet dataset. Trades are always stored in SQLite",
+    )
+    parser.add_argument(
+        "--parquet-path",
+        help="Path to the Parquet options dataset used by the arrow backend",
+    )
+
+
+# Maps the sweep CLI argument to the strategy argument it provides values for
+SWEEP_ARGUMENTS = {
+    "dte_list": "dte",
+    "profit_take_list": "profit_take",
+    "stop_loss_list": "stop_loss",
+}
+
+
+def add_sweep_cli_arguments(parser):
+    parser.add_argument(
+        "--dte-list",
+        type=lambda value: [int(dte) for dte in value.split(",")],
+        help="Comma separated list of DTEs to backtest in parallel (eg. 7,14,30)",
+    )
+    parser.add_argument(
+        "--profit-take-list",
+        type=lambda value: [float(profit_take) for profit_take in value.split(",")],
+        help="Comma separated list of profit take percentages to backtest in parallel (eg. 10,25,50)",
+    )
+    parser.add_argument(
+        "--stop-loss-list",
+        type=lambda value: [float(stop_loss) for stop_loss in value.split(",")],
+        help="Comma separated list of stop loss percentages to backtest in parallel (eg. 50,75,100)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="Number of worker processes used for parameter sweeps (default: CPU count)",
+    )
+
+
+def is_parameter_sweep(args):
+    return any(getattr(args, sweep_arg, None) for sweep_arg in SWEEP_ARGUMENTS)
+
+
+def build_parameter_grid(args):
+    sweep_values = {
+        param: getattr(args, sweep_arg)
+        for sweep_arg, param in SWEEP_ARGUMENTS.items()
+        if getattr(args, sweep_arg, None)
+    }
+    return [
+        dict(zip(sweep_values, values)) for values in product(*sweep_values.values())
+    ]
+
+
+def run_strategy(strategy_cls, args):
+    with strategy_cls(args) as runner:
+        runner.run()
+    return runner.db.table_tag
+
+
+def run_parameter_sweep(strategy_cls, args):
+    """Run a backtest for every parameter combination using a pool of worker processes"""
+    base_params = {
+        key: value
+        for key, value in vars(args).items()
+        if key not in SWEEP_ARGUMENTS and key != "workers"
+    }
+    # Each run needs its own tables as the default timestamp key is only unique per second
+    sweep_tag = datetime.now().strftime("%Y%m%d%H%M%S")
+    runs_args = [
+        argparse.Namespace(
+            **{**base_params, **params, "table_name_key": f"{sweep_tag}_{idx}"}
+        )
+        for idx, params in enumerate(build_parameter_grid(args))
+    ]
+
+    # Create the shared indexes once rather than having every worker wait on the same lock
+    with open_options_database(args, strategy_cls.__name__.lower(), sweep_tag) as db:
+        db.setup_options_data_indexes()
+
+    max_workers = getattr(args, "workers", None) or os.cpu_count()
+    logging.info(f"Running {len(runs_args)} backtests with {max_workers} workers")
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        for table_tag in executor.map(run_strategy, repeat(strategy_cls), runs_args):
+            logging.info(f"Completed backtest run {table_tag}")
 
 
 def check_if_passed_days(data_for_trade_management, existing_trade_trade_date):
@@ -919,7 +1342,7 @@ def check_if_passed_days(data_for_trade_management, existing_trade_trade_date):
 
     trade_start_date = existing_trade_trade_date
     current_date = data_for_trade_management.quote_date
-    days_passed = calculate_date_difference(trade_start_date, current_date)
+    days_passed = days_between(trade_start_date, current_date)
     return days_passed >= data_for_trade_management.force_close_after_days
 
 
@@ -933,7 +1356,11 @@ class GenericRunner:
         self.force_close_after_days = args.force_close_after_days
         self.profit_take = args.profit_take
         self.stop_loss = args.stop_loss
-        self.db = OptionsDatabase(args.db_path, self.__class__.__name__.lower())
+        self.db = open_options_database(
+            args,
+            self.__class__.__name__.lower(),
+            getattr(args, "table_name_key", None),
+        )
 
     def __enter__(self):
         self.db.connect()
@@ -951,106 +1378,152 @@ class GenericRunner:
 
         self.pre_run(db, quote_dates)
 
+        # Only the quote date and open trade count change between quote dates
+        data_for_trade_management = DataForTradeManagement(
+            self.max_open_trades,
+            self.trade_delay,
+            self.force_close_after_days,
+            self.profit_take,
+            self.stop_loss,
+            None,
+        )
         for quote_date in quote_dates:
-            logging.info(f"Processing {quote_date}")
-            data_for_trade_management = DataForTradeManagement(
-                self.max_open_trades,
-                self.trade_delay,
-                self.force_close_after_days,
-                self.profit_take,
-                self.stop_loss,
-                quote_date,
-            )
-
-            # Update Open Trades
-            open_trades = db.get_open_trades()
+            data_for_trade_management.quote_date = quote_date
+            # One transaction per quote date rather than a commit for every trade update
+            with db.conn:
+                self.process_quote_date(db, data_for_trade_management)
+
+    def process_quote_date(self, db, data_for_trade_management):
+        quote_date = data_for_trade_management.quote_date
+        logging.info(f"Processing {quote_date}")
+
+        # Update Open Trades
+        open_trades = [
+            self.load_open_trade(db, trade_id, quote_date)
+            for trade_id, _ in db.iter_open_trades()
+        ]
+        open_trade_count = len(open_trades)
+        # Fetch prices for the legs of every open trade at once
+        current_options_data = db.get_current_options_data_for_legs(
+            quote_date,
+            [leg for existing_trade in open_trades for leg in existing_trade.legs],
+        )
 
-            for _, trade in open_trades.iterrows():
-                try:
-                    existing_trade_id = trade["TradeId"]
-                    logging.info(
-                        f"{data_for_trade_management.quote_date} => Updating existing trade {existing_trade_id}"
-                    )
+        updated_trade_legs = [
+            [
+                item["updated"]
+                for item in db.update_trade_legs(
+                    existing_trade.legs,
+                    data_for_trade_management.quote_date,
+                    current_options_data,
+                )
+            ]
+            for existing_trade in open_trades
+        ]
+        current_premium_values = [
+            round(sum(l.premium_current for l in updated_legs), 2)
+            for updated_legs in updated_trade_legs
+        ]
+        # Check profit take and stop loss targets for every open trade at once
+        profit_take_stop_loss = profit_take_stop_loss_targets(
+            data_for_trade_management.profit_take,
+            data_for_trade_management.stop_loss,
+            [existing_trade.premium_captured for existing_trade in open_trades],
+            current_premium_values,
+        )
 
-                    trade_from_db = db.load_trade_with_multiple_legs(
-                        existing_trade_id, leg_type=LegType.TRADE_OPEN
-                    )
-                    existing_trade = (
-                        self.adjust_trade(db, trade_from_db, quote_date)
-                        if (
-                            hasattr(self, "adjust_trade")
-                            and self.adjust_trade.__func__
-                            is not GenericRunner.adjust_trade
+        closed_trades = []
+        for (
+            existing_trade,
+            updated_legs,
+            current_premium_value,
+            profit_take_stop_loss_target,
+        ) in zip(
+            open_trades,
+            updated_trade_legs,
+            current_premium_values,
+            profit_take_stop_loss,
+        ):
+            try:
+                existing_trade_id = existing_trade.id
+                close_reason, trade_can_be_closed = self.check_if_trade_can_be_closed(
+                    data_for_trade_management,
+                    existing_trade.premium_captured,
+                    existing_trade.trade_date,
+                    existing_trade.expire_date,
+                    current_premium_value,
+                    profit_take_stop_loss_target,
+                )
+
+                existing_trade.legs = [
+                    dataclasses.replace(
+                        leg,
+                        leg_type=(
+                            LegType.TRADE_CLOSE
+                            if trade_can_be_closed
+                            else LegType.TRADE_AUDIT
                         )
-                        else trade_from_db
+                        if leg.historyId
+                        else leg.leg_type,
                     )
+                    for leg in updated_legs
+                ]
 
-                    trade_legs_with_updates = db.update_trade_legs(
-                        existing_trade.legs, data_for_trade_management.quote_date
+                if trade_can_be_closed:
+                    logging.debug(
+                        f"Trying to close trade {existing_trade_id} at expiry {data_for_trade_management.quote_date}"
                     )
-                    updated_legs = [item["updated"] for item in trade_legs_with_updates]
-
-                    close_reason, trade_can_be_closed = (
-                        self.check_if_trade_can_be_closed(
-                            data_for_trade_management,
-                            existing_trade.premium_captured,
-                            existing_trade.trade_date,
-                            existing_trade.expire_date,
-                            updated_legs,
-                        )
+                    # Negate because we reverse the positions (Buying back Short option and Selling Long option)
+                    existing_trade.closing_premium = -current_premium_value
+                    existing_trade.closed_trade_at = (
+                        data_for_trade_management.quote_date
                     )
-
-                    existing_trade.legs = [
-                        dataclasses.replace(
-                            leg,
-                            leg_type=(
-                                LegType.TRADE_CLOSE
-                                if trade_can_be_closed
-                                else LegType.TRADE_AUDIT
-                            )
-                            if leg.historyId
-                            else leg.leg_type,
-                        )
-                        for leg in updated_legs
-                    ]
-
-                    db.update_trade_with_multiple_legs(existing_trade)
-
-                    if trade_can_be_closed:
-                        logging.debug(
-                            f"Trying to close trade {trade['TradeId']} at expiry {data_for_trade_management.quote_date}"
-                        )
-                        # Multiply by -1 because we reverse the positions (Buying back Short option and Selling Long option)
-                        existing_trade.closing_premium = round(
-                            -1 * sum(l.premium_current for l in updated_legs), 2
-                        )
-                        existing_trade.closed_trade_at = (
-                            data_for_trade_management.quote_date
-                        )
-                        existing_trade.close_reason = close_reason
-                        db.close_trade(existing_trade_id, existing_trade)
-                        logging.info(
-                            f"Closed trade {trade['TradeId']} with {existing_trade.closing_premium} at expiry"
-                        )
-                    else:
-                        logging.debug(
-                            f"Trade {trade['TradeId']} still open as {data_for_trade_management.quote_date} < {trade['ExpireDate']}"
-                        )
-                except Exception as e:
-                    logging.error(
-                        f"Failed to process open trade {trade['TradeId']} -> {e}"
+                    existing_trade.close_reason = close_reason
+                    closed_trades.append(existing_trade)
+                    open_trade_count -= 1
+                    logging.info(
+                        f"Closed trade {existing_trade_id} with {existing_trade.closing_premium} at expiry"
                     )
-                    raise e
-
-            if not self.allowed_to_create_new_trade(db, data_for_trade_management):
-                continue
-
-            trade_to_setup = self.build_trade(db, quote_date)
-            if not trade_to_setup:
-                continue
-
-            trade_id = db.create_trade_with_multiple_legs(trade_to_setup)
-            logging.info(f"Trade {trade_id} created in database")
+                else:
+                    logging.debug(
+                        f"Trade {existing_trade_id} still open as {data_for_trade_management.quote_date} < {existing_trade.expire_date}"
+                    )
+            except Exception as e:
+                logging.error(
+                    f"Failed to process open trade {existing_trade_id} -> {e}"
+                )
+                raise e
+
+        # Write all the trade updates for the day in one go
+        db.update_trades_with_multiple_legs(open_trades)
+        db.close_trades(closed_trades)
+
+        data_for_trade_management.open_trade_count = open_trade_count
+        if not self.allowed_to_create_new_trade(db, data_for_trade_management):
+            return
+
+        trade_to_setup = self.build_trade(db, quote_date)
+        if not trade_to_setup:
+            return
+
+        trade_id = db.create_trade_with_multiple_legs(trade_to_setup)
+        logging.info(f"Trade {trade_id} created in database")
+
+    def load_open_trade(self, db, trade_id, quote_date) -> Trade:
+        logging.info(f"{quote_date} => Updating existing trade {trade_id}")
+        try:
+            trade_from_db = db.load_trade_with_multiple_legs(
+                trade_id, leg_type=LegType.TRADE_OPEN
+            )
+            if (
+                hasattr(self, "adjust_trade")
+                and self.adjust_trade.__func__ is not GenericRunner.adjust_trade
+            ):
+                return self.adjust_trade(db, trade_from_db, quote_date)
+            return trade_from_db
+        except Exception as e:
+            logging.error(f"Failed to process open trade {trade_id} -> {e}")
+            raise e
 
     def check_if_trade_can_be_closed(
         self,
@@ -1058,13 +1531,17 @@ class GenericRunner:
         trade_premium_captured,
         trade_start_date,
         trade_expire_date,
-        updated_legs,
+        current_premium_value,
+        profit_take_stop_loss_target=None,
     ):
-        close_reason, trade_can_be_closed = check_profit_take_stop_loss_targets(
-            data_for_trade_management.profit_take,
-            data_for_trade_management.stop_loss,
-            trade_premium_captured,
-            updated_legs,
+        close_reason, trade_can_be_closed = (
+            profit_take_stop_loss_target
+            or check_profit_take_stop_loss_targets(
+                data_for_trade_management.profit_take,
+                data_for_trade_management.stop_loss,
+                trade_premium_captured,
+                current_premium_value,
+            )
         )
         if trade_can_be_closed:
             return close_reason, True
@@ -1079,7 +1556,8 @@ class GenericRunner:
 
     def allowed_to_create_new_trade(self, options_db, data_for_trade_management):
         if not within_max_open_trades(
-            options_db, data_for_trade_management.max_open_trades
+            data_for_trade_management.open_trade_count,
+            data_for_trade_management.max_open_trades,
         ):
             return False
 
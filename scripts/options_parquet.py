@@ -0,0 +1,300 @@
+import dataclasses
+import logging
+from typing import Dict, List, Optional, Tuple
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+from options_analysis import (
+    ContractType,
+    Leg,
+    OptionsData,
+    OptionsDatabase,
+    PositionType,
+    cache_options_lookup,
+)
+
+OPTIONS_DATA_COLUMNS = [f.name.upper() for f in dataclasses.fields(OptionsData)]
+
+# Options data is exported with one directory per expiry, eg. EXPIRE_DATE=2020-01-17
+PARTITIONING = ds.partitioning(pa.schema([("EXPIRE_DATE", pa.string())]), flavor="hive")
+
+
+def options_data_from(table: pa.Table) -> List[OptionsData]:
+    """Convert all the rows of the table, a column at a time"""
+    columns = [table[column].to_pylist() for column in OPTIONS_DATA_COLUMNS]
+    return [OptionsData(*values) for values in zip(*columns)]
+
+
+class ArrowOptionsDatabase(OptionsDatabase):
+    """Reads options data from a Parquet dataset while trades are still stored in SQLite"""
+
+    def __init__(self, db_path, parquet_path, strategy_name, table_name_key=None):
+        super().__init__(db_path, strategy_name, table_name_key)
+        self.parquet_path = parquet_path
+        self.dataset = None
+
+    def connect(self):
+        super().connect()
+        logging.info(f"Opening options dataset: {self.parquet_path}")
+        self.dataset = ds.dataset(
+            self.parquet_path, format="parquet", partitioning=PARTITIONING
+        )
+
+    def setup_options_data_indexes(self):
+        """Options data is not read from SQLite so there is nothing to index"""
+        pass
+
+    def _read(self, filter_expression, columns=None) -> pa.Table:
+        return self.dataset.to_table(
+            columns=columns or OPTIONS_DATA_COLUMNS, filter=filter_expression
+        )
+
+    def get_current_options_data(
+        self, quote_date: str, strike_price: float, expire_date: str
+    ) -> Optional[OptionsData]:
+        """Get current prices for a specific strike and expiration"""
+        table = self._read(
+            (ds.field("EXPIRE_DATE") == expire_date)
+            & (ds.field("QUOTE_DATE") == quote_date)
+            & (ds.field("STRIKE") == strike_price)
+        )
+        return options_data_from(table.slice(0, 1))[0] if table.num_rows else None
+
+    def get_current_options_data_for_legs(
+        self, quote_date: str, legs: List[Leg]
+    ) -> Dict[Tuple[float, str], OptionsData]:
+        """Get current prices for all the legs in a single scan, keyed by (strike, expiration)"""
+        contracts = {(leg.strike_price, leg.leg_expiry_date) for leg in legs}
+        if not contracts:
+            return {}
+
+        strikes, expiry_dates = zip(*contracts)
+        table = self._read(
+            ds.field("EXPIRE_DATE").isin(list(set(expiry_dates)))
+            & (ds.field("QUOTE_DATE") == quote_date)
+            & ds.field("STRIKE").isin(list(set(strikes)))
+        )
+
+        current_options_data = {}
+        for od in options_data_from(table):
+            if (od.strike, od.expire_date) in contracts:
+                current_options_data.setdefault((od.strike, od.expire_date), od)
+        return current_options_data
+
+    def get_quote_dates(self, start_date=None, end_date=None):
+        """Get all unique quote dates"""
+        filter_expression = None
+        if start_date is not None and end_date is not None:
+            filter_expression = (ds.field("QUOTE_DATE") >= start_date) & (
+                ds.field("QUOTE_DATE") <= end_date
+            )
+        quote_dates = self._read(filter_expression, columns=["QUOTE_DATE"])
+        dates = sorted(pc.unique(quote_dates["QUOTE_DATE"]).to_pylist())
+        logging.debug(f"Found {len(dates)} unique quote dates")
+        return dates
+
+    @cache_options_lookup
+    def get_next_expiry_by_dte(self, quote_date, min_dte):
+        """
+        Get the next expiration date where DTE is greater than the specified number of days
+        for a specific quote date
+        Returns tuple of (expiry_date, actual_dte) or None if not found
+        """
+        # Expiry partitions before the quote date can be skipped without being read
+        table = self._read(
+            (ds.field("EXPIRE_DATE") >= quote_date)
+            & (ds.field("QUOTE_DATE") == quote_date)
+            & (ds.field("DTE") >= min_dte),
+            columns=["EXPIRE_DATE", "DTE"],
+        )
+        if not table.num_rows:
+            logging.debug(f"No expiration found with DTE > {min_dte} from {quote_date}")
+            return None
+
+        row = pc.sort_indices(table, sort_keys=[("EXPIRE_DATE", "ascending")])[0]
+        result = table["EXPIRE_DATE"][row].as_py(), table["DTE"][row].as_py()
+        logging.debug(f"Found next expiration: {result[0]} with DTE: {result[1]}")
+        return result
+
+    def preload_next_expiries(self, quote_dates, min_dte):
+        """Find the next expiration for all quote dates in a single scan"""
+        if not quote_dates:
+            return
+
+        table = self._read(
+            (ds.field("QUOTE_DATE") >= quote_dates[0])
+            & (ds.field("QUOTE_DATE") <= quote_dates[-1])
+            & (ds.field("DTE") >= min_dte),
+            columns=["QUOTE_DATE", "EXPIRE_DATE", "DTE"],
+        )
+        # Reduce to one row per quote date and expiry before picking the nearest expiry
+        expiries = table.group_by(["QUOTE_DATE", "EXPIRE_DATE"]).aggregate(
+            [("DTE", "min")]
+        )
+        next_expiries = {}
+        for quote_date, expire_date, dte in zip(
+            expiries["QUOTE_DATE"].to_pylist(),
+            expiries["EXPIRE_DATE"].to_pylist(),
+            expiries["DTE_min"].to_pylist(),
+        ):
+            if (
+                quote_date not in next_expiries
+                or expire_date < next_expiries[quote_date][0]
+            ):
+                next_expiries[quote_date] = (expire_date, dte)
+        self.cache_next_expiries(quote_dates, min_dte, next_expiries)
+
+    def _next_expiry_options(self, quote_dates, min_dte) -> pa.Table:
+        """All options at the next expiry (DTE >= min_dte) of each quote date"""
+        # The next expiry is picked from two columns before any full rows are read
+        expiries = self._read(
+            (ds.field("QUOTE_DATE") >= quote_dates[0])
+            & (ds.field("QUOTE_DATE") <= quote_dates[-1])
+            & (ds.field("DTE") >= min_dte),
+            columns=["QUOTE_DATE", "EXPIRE_DATE"],
+        )
+        next_expiry = (
+            expiries.group_by("QUOTE_DATE")
+            .aggregate([("EXPIRE_DATE", "min")])
+            .rename_columns(["QUOTE_DATE", "EXPIRE_DATE"])
+        )
+        if not next_expiry.num_rows:
+            return self.dataset.schema.empty_table().select(OPTIONS_DATA_COLUMNS)
+
+        # Only the partitions of those expiries are read, one at a time and only for
+        # the quote dates they are the next expiry of
+        quote_date_ranges = next_expiry.group_by("EXPIRE_DATE").aggregate(
+            [("QUOTE_DATE", "min"), ("QUOTE_DATE", "max")]
+        )
+        quote_date_ranges = dict(
+            zip(
+                quote_date_ranges["EXPIRE_DATE"].to_pylist(),
+                zip(
+                    quote_date_ranges["QUOTE_DATE_min"].to_pylist(),
+                    quote_date_ranges["QUOTE_DATE_max"].to_pylist(),
+                ),
+            )
+        )
+        tables = []
+        for fragment in self.dataset.get_fragments(
+            filter=ds.field("EXPIRE_DATE").isin(list(quote_date_ranges))
+        ):
+            expire_date = ds.get_partition_keys(fragment.partition_expression)[
+                "EXPIRE_DATE"
+            ]
+            first_quote_date, last_quote_date = quote_date_ranges[expire_date]
+            tables.append(
+                fragment.to_table(
+                    schema=self.dataset.schema,
+                    columns=OPTIONS_DATA_COLUMNS,
+                    filter=(ds.field("QUOTE_DATE") >= first_quote_date)
+                    & (ds.field("QUOTE_DATE") <= last_quote_date),
+                )
+            )
+
+        # A quote date inside an expiry's range can still have an earlier next expiry
+        return pa.concat_tables(tables).join(
+            next_expiry, keys=["QUOTE_DATE", "EXPIRE_DATE"], join_type="inner"
+        )
+
+    @staticmethod
+    def _first_option_per_quote_date(table: pa.Table, rank_column) -> List[OptionsData]:
+        table = table.sort_by(
+            [
+                ("QUOTE_DATE", "ascending"),
+                (rank_column, "ascending"),
+                ("STRIKE", "ascending"),
+            ]
+        )
+        quote_dates = table["QUOTE_DATE"].to_pylist()
+        first_rows = [
+            row
+            for row, quote_date in enumerate(quote_dates)
+            if row == 0 or quote_date != quote_dates[row - 1]
+        ]
+        return options_data_from(table.take(pa.array(first_rows, type=pa.int64())))
+
+    def preload_options_by_delta(
+        self,
+        contract_type: ContractType,
+        position_type: PositionType,
+        quote_dates,
+        min_dte,
+        required_delta,
+    ):
+        """Pick the option closest to the required delta at the next expiry in a single scan"""
+        if not quote_dates:
+            return
+
+        delta_column = "C_DELTA" if contract_type == ContractType.CALL else "P_DELTA"
+        delta_sign = 1 if position_type == PositionType.LONG else -1
+
+        candidates = self._next_expiry_options(quote_dates, min_dte)
+        delta_distance = pc.abs(
+            pc.subtract(
+                pc.multiply(candidates[delta_column], delta_sign), required_delta
+            )
+        )
+        options = self._first_option_per_quote_date(
+            candidates.append_column("DELTA_DISTANCE", delta_distance),
+            "DELTA_DISTANCE",
+        )
+        self.cache_options_by_delta(
+            contract_type, position_type, required_delta, options
+        )
+
+    def preload_options_closest_to_price(self, quote_dates, min_dte):
+        """Pick the option closest to the underlying price at the next expiry in a single scan"""
+        if not quote_dates:
+            return
+
+        options = self._first_option_per_quote_date(
+            self._next_expiry_options(quote_dates, min_dte), "STRIKE_DISTANCE"
+        )
+        self.cache_options_closest_to_price(options)
+
+    @cache_options_lookup
+    def get_options_data_closest_to_price(
+        self, quote_date, expiry_date
+    ) -> Optional[OptionsData]:
+        table = self._read(
+            (ds.field("EXPIRE_DATE") == expiry_date)
+            & (ds.field("QUOTE_DATE") == quote_date)
+        )
+        if not table.num_rows:
+            return None
+
+        row = pc.sort_indices(
+            table,
+            sort_keys=[("STRIKE_DISTANCE", "ascending"), ("STRIKE", "ascending")],
+        )[0]
+        return options_data_from(table.slice(row.as_py(), 1))[0]
+
+    @cache_options_lookup
+    def get_options_by_delta(
+        self,
+        contract_type: ContractType,
+        position_type: PositionType,
+        quote_date,
+        expiry_date,
+        required_delta,
+    ):
+        delta_column = "C_DELTA" if contract_type == ContractType.CALL else "P_DELTA"
+        delta_sign = 1 if position_type == PositionType.LONG else -1
+
+        table = self._read(
+            (ds.field("EXPIRE_DATE") == expiry_date)
+            & (ds.field("QUOTE_DATE") == quote_date)
+        )
+        if not table.num_rows:
+            return None
+
+        delta_distance = pc.abs(
+            pc.subtract(pc.multiply(table[delta_column], delta_sign), required_delta)
+        )
+        row = pc.sort_indices(
+            table.append_column("DELTA_DISTANCE", delta_distance),
+            sort_keys=[("DELTA_DISTANCE", "ascending"), ("STRIKE", "ascending")],
+        )[0]
+        return options_data_from(table.slice(row.as_py(), 1))[0]
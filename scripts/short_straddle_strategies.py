@@ -1,29 +1,32 @@
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from typing import Optional
 
+import numpy as np
 import pandas as pd
+from indicators import rolling_median, rsi_by_date
 from market_data import load_market_data
 from options_analysis import (
     ContractType,
     DataForTradeManagement,
     GenericRunner,
     Leg,
-    LegType,
     OptionsData,
     OptionsDatabase,
     PositionType,
     Trade,
+    build_open_leg,
 )
-from pandas import DataFrame
 
 
 def calculate_legs_for_straddle(
-    options_db, quote_date, expiry_dte, quantity=1
+    options_db: OptionsDatabase, quote_date: str, expiry_dte: str, quantity: int = 1
 ) -> tuple[list[Leg], Optional[float]]:
     od: OptionsData = options_db.get_options_data_closest_to_price(
         quote_date, expiry_dte
     )
-    if not od or od.p_last in [None, 0] or od.c_last in [None, 0]:
+    if not od or not od.p_last or not od.c_last:
         logging.warning(
             "⚠️ Bad data found: "
             + (
@@ -34,57 +37,41 @@ def calculate_legs_for_straddle(
         )
         return [], None
 
-    base_legs = [
-        Leg(
-            leg_quote_date=quote_date,
-            leg_expiry_date=expiry_dte,
-            leg_type=LegType.TRADE_OPEN,
-            position_type=PositionType.SHORT,
-            contract_type=ContractType.PUT,
-            strike_price=od.strike,
-            underlying_price_open=od.underlying_last,
-            premium_open=od.p_last,
-            premium_current=0,
-            delta=od.p_delta,
-            gamma=od.p_gamma,
-            vega=od.p_vega,
-            theta=od.p_theta,
-            iv=od.p_iv,
-        ),
-        Leg(
-            leg_quote_date=quote_date,
-            leg_expiry_date=expiry_dte,
-            leg_type=LegType.TRADE_OPEN,
-            position_type=PositionType.SHORT,
-            contract_type=ContractType.CALL,
-            strike_price=od.strike,
-            underlying_price_open=od.underlying_last,
-            premium_open=od.c_last,
-            premium_current=0,
-            delta=od.c_delta,
-            gamma=od.c_gamma,
-            vega=od.c_vega,
-            theta=od.c_theta,
-            iv=od.c_iv,
-        ),
-    ]
-
-    trade_legs = base_legs * quantity
-    premium_captured_calculated = round(sum(leg.premium_open for leg in trade_legs), 2)
-    return trade_legs, premium_captured_calculated
-
-
-def populate_volatility_data(quote_dates, window) -> DataFrame:
+    put_leg = build_open_leg(
+        od, quote_date, expiry_dte, PositionType.SHORT, ContractType.PUT
+    )
+    call_leg = build_open_leg(
+        od, quote_date, expiry_dte, PositionType.SHORT, ContractType.CALL
+    )
+    premium_captured_calculated = round(
+        (put_leg.premium_open + call_leg.premium_open) * quantity, 2
+    )
+    return [put_leg, call_leg] * quantity, premium_captured_calculated
+
+
+def populate_volatility_data(quote_dates: list[str], window: int) -> pd.Series:
+    return volatility_data(quote_dates[0], quote_dates[-1], window)
+
+
+# Sweep workers backtest the same dates again and again, so the signal is built once
+# per process on top of the persistent cache of the downloaded prices
+@lru_cache(maxsize=None)
+def volatility_data(start_date: str, end_date: str, window: int) -> pd.Series:
+    """High vol signal from the implied volatility term structure (VIX9D / VIX)"""
     symbols = ["^VIX9D", "^VIX"]
-    market_data = load_market_data(quote_dates, symbols)
+    market_data = load_market_data([start_date, end_date], symbols)
 
-    df = pd.DataFrame()
-    df["Short_Term_VIX"] = market_data["^VIX9D"]["close"]
-    df["Long_Term_VIX"] = market_data["^VIX"]["close"]
-    df["IVTS"] = df["Short_Term_VIX"] / df["Long_Term_VIX"]
-    df[f"IVTS_Med_{window}"] = df["IVTS"].rolling(window=window).median()
-    df["High_Vol_Signal"] = (df[f"IVTS_Med_{window}"] < 1).astype(int) * 2 - 1
-    return df
+    short_term_vix = market_data["^VIX9D"]["close"]
+    long_term_vix = market_data["^VIX"]["close"].reindex(short_term_vix.index)
+    ivts = short_term_vix.to_numpy(dtype=np.float64) / long_term_vix.to_numpy(
+        dtype=np.float64
+    )
+    ivts_median = rolling_median(ivts, window)
+    # NaN medians (not enough history) compare as False, same as a low vol day
+    high_vol_signal = np.where(ivts_median < 1, np.int8(1), np.int8(-1))
+    return pd.Series(
+        high_vol_signal, index=short_term_vix.index, name="High_Vol_Signal"
+    )
 
 
 class ShortStraddleStrategy(GenericRunner):
@@ -102,7 +89,7 @@ class ShortStraddleStrategy(GenericRunner):
             and getattr(args, "rsi_low_threshold", None)
             and getattr(args, "rsi_high_threshold", None)
         )
-        self.rsi_indicator = f"rsi_{getattr(args, 'rsi', '')}"
+        self.rsi = getattr(args, "rsi", None)
         self.rsi_low_threshold = getattr(args, "rsi_low_threshold", None)
         self.rsi_high_threshold = getattr(args, "rsi_high_threshold", None)
 
@@ -112,50 +99,71 @@ class ShortStraddleStrategy(GenericRunner):
             args, "ladder_additional_contracts", False
         )
 
-        # DataFrames for external data
-        self.volatility_df = None
-        self.rsi_df = None
-
-    def pre_run(self, options_db: OptionsDatabase, quote_dates):
-        if self.high_vol_check_required:
-            self.volatility_df = populate_volatility_data(
-                quote_dates, self.high_vol_check_window
+        # External market data, keyed by quote date (YYYY-MM-DD)
+        self._high_vol_signal_map = {}
+        self._rsi_map = {}
+
+    def pre_run(self, options_db: OptionsDatabase, quote_dates: list[str]):
+        underlying = "SPY"
+        # Market data downloads run in the background while the options lookups are preloaded
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            high_vol_signal = (
+                executor.submit(
+                    populate_volatility_data, quote_dates, self.high_vol_check_window
+                )
+                if self.high_vol_check_required
+                else None
             )
+            underlying_data = (
+                executor.submit(load_market_data, quote_dates, [underlying])
+                if self.rsi_check_required
+                else None
+            )
+
+            options_db.preload_next_expiries(quote_dates, self.dte)
+            options_db.preload_options_closest_to_price(quote_dates, self.dte)
+
+            if high_vol_signal:
+                signal = high_vol_signal.result()
+                self._high_vol_signal_map = dict(
+                    zip(signal.index.strftime("%Y-%m-%d"), signal.tolist())
+                )
 
-        if self.rsi_check_required:
-            underlying = "SPY"
-            market_data = load_market_data(quote_dates, [underlying])
-            self.rsi_df = market_data[underlying]
-            _ = self.rsi_df[self.rsi_indicator]
+            if underlying_data:
+                market_data = underlying_data.result()
+                self._rsi_map = rsi_by_date(market_data[underlying]["close"], self.rsi)
 
-    def in_high_vol_regime(self, quote_date) -> bool:
+    def in_high_vol_regime(self, quote_date: str) -> bool:
         if not self.high_vol_check_required:
             return True
 
-        try:
-            signal_value = self.volatility_df.loc[quote_date, "High_Vol_Signal"]
-            if signal_value == 1:
-                return False
-            logging.debug(
-                f"High Vol environment. The Signal value for {quote_date} is {signal_value}"
-            )
-            return True
-        except KeyError:
-            logging.debug(f"Date {quote_date} not found in DataFrame.")
+        signal_value = self._high_vol_signal_map.get(quote_date)
+        if signal_value is None:
+            logging.debug("Date %s not found in volatility data.", quote_date)
             return False
+        if signal_value == 1:
+            return False
+        logging.debug(
+            "High Vol environment. The Signal value for %s is %s",
+            quote_date,
+            signal_value,
+        )
+        return True
 
-    def check_rsi_conditions(self, quote_date) -> bool:
+    def check_rsi_conditions(self, quote_date: str) -> bool:
         if not self.rsi_check_required:
             return True
 
-        if quote_date in self.rsi_df.index:
-            rsi_value = self.rsi_df.loc[quote_date, self.rsi_indicator]
-            return self.rsi_low_threshold < rsi_value < self.rsi_high_threshold
-        return False
+        rsi_value = self._rsi_map.get(quote_date)
+        if rsi_value is None:
+            return False
+        return self.rsi_low_threshold < rsi_value < self.rsi_high_threshold
 
     def allowed_to_create_new_trade(
-        self, options_db, data_for_trade_management: DataForTradeManagement
-    ):
+        self,
+        options_db: OptionsDatabase,
+        data_for_trade_management: DataForTradeManagement,
+    ) -> bool:
         allowed_based_on_default_checks = super().allowed_to_create_new_trade(
             options_db, data_for_trade_management
         )
@@ -167,13 +175,20 @@ class ShortStraddleStrategy(GenericRunner):
             data_for_trade_management.quote_date
         ) and self.check_rsi_conditions(data_for_trade_management.quote_date)
 
-    def build_trade(self, options_db, quote_date) -> Optional[Trade]:
+    def build_trade(
+        self, options_db: OptionsDatabase, quote_date: str
+    ) -> Optional[Trade]:
         expiry_dte, dte_found = options_db.get_next_expiry_by_dte(quote_date, self.dte)
         if not expiry_dte:
             logging.warning(f"⚠️ Unable to find {self.dte} expiry. {expiry_dte=}")
             return None
 
-        logging.debug(f"Quote date: {quote_date} -> {expiry_dte=} ({dte_found=:.1f}), ")
+        logging.debug(
+            "Quote date: %s -> expiry_dte=%r (dte_found=%.1f)",
+            quote_date,
+            expiry_dte,
+            dte_found,
+        )
 
         quantity = 1 if self.ladder_additional_contracts else self.total_contracts
         trade_legs, premium = calculate_legs_for_straddle(
@@ -193,7 +208,7 @@ class ShortStraddleStrategy(GenericRunner):
         )
 
     def adjust_trade(
-        self, db: OptionsDatabase, existing_trade: Trade, quote_date
+        self, db: OptionsDatabase, existing_trade: Trade, quote_date: str
     ) -> Trade:
         existing_expiry = existing_trade.expire_date
         # Make sure we only allow the specified number of contracts
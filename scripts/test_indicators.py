@@ -0,0 +1,107 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+from indicators import rolling_median, rsi, rsi_by_date
+
+
+class TestRollingMedian(unittest.TestCase):
+    def assert_same_as_pandas(self, values, window):
+        expected = pd.Series(values).rolling(window).median().to_numpy()
+        np.testing.assert_array_equal(rolling_median(values, window), expected)
+
+    def test_matches_pandas_for_finite_values(self):
+        rng = np.random.default_rng(7)
+        for window in range(1, 12):
+            values = rng.normal(1, 0.1, 60)
+            self.assert_same_as_pandas(values, window)
+
+    def test_matches_pandas_with_repeated_values(self):
+        rng = np.random.default_rng(11)
+        for window in range(1, 8):
+            values = rng.integers(0, 4, 50).astype(np.float64)
+            self.assert_same_as_pandas(values, window)
+
+    def test_matches_pandas_with_missing_and_infinite_values(self):
+        rng = np.random.default_rng(3)
+        for window in range(1, 10):
+            for _ in range(20):
+                values = rng.normal(1, 0.1, 40)
+                for missing in (np.nan, np.inf, -np.inf):
+                    values[rng.random(40) < 0.05] = missing
+                self.assert_same_as_pandas(values, window)
+
+    def test_window_longer_than_values(self):
+        self.assert_same_as_pandas(np.array([1.0, 2.0, 3.0]), 5)
+
+    def test_rejects_empty_window(self):
+        with self.assertRaises(ValueError):
+            rolling_median(np.array([1.0, 2.0]), 0)
+
+
+class TestRsi(unittest.TestCase):
+    def test_wilder_smoothing(self):
+        # Changes +1, -1, +1, +1: the first averages are the simple means of the first
+        # two changes (0.5 / 0.5), then each change is blended in with weight 1 / window
+        close = np.array([1.0, 2.0, 1.0, 2.0, 3.0])
+        np.testing.assert_array_equal(rsi(close, 2), [np.nan, np.nan, 50.0, 75.0, 87.5])
+
+    def test_wilder_smoothing_after_a_loss(self):
+        # Changes +1, -1, +2, -1: averages 1 / (1/3), then gain 2/3 and loss 5/9
+        close = np.array([10.0, 11.0, 10.0, 12.0, 11.0])
+        result = rsi(close, 3)
+        self.assertTrue(np.isnan(result[:3]).all())
+        self.assertAlmostEqual(result[3], 75.0)
+        self.assertAlmostEqual(result[4], 100 - 100 / (1 + 1.2))
+
+    def test_no_value_until_window_changes(self):
+        self.assertTrue(np.isnan(rsi(np.arange(14, dtype=np.float64), 14)).all())
+        result = rsi(np.arange(15, dtype=np.float64), 14)
+        self.assertTrue(np.isnan(result[:14]).all())
+        self.assertEqual(result[14], 100.0)
+
+    def test_without_losses(self):
+        rising = rsi(np.arange(10, dtype=np.float64), 3)
+        np.testing.assert_array_equal(rising[3:], np.full(7, 100.0))
+
+        flat = rsi(np.full(10, 5.0), 3)
+        np.testing.assert_array_equal(flat[3:], np.full(7, 50.0))
+
+    def test_missing_close_is_skipped(self):
+        # Changes +1, -1, (missing), (missing), +1: no value on the missing day, the
+        # averages carry over it and the next change is blended in as usual
+        close = np.array([1.0, 2.0, 1.0, np.nan, 2.0, 3.0])
+        np.testing.assert_array_equal(
+            rsi(close, 2), [np.nan, np.nan, 50.0, np.nan, 50.0, 75.0]
+        )
+
+    def test_missing_close_in_first_window(self):
+        # Only the +1 and -2 changes seed the averages: gain 1/2, loss 2/2, then +1
+        # blends in to gain 2.5/4, loss 3/4
+        close = np.array([1.0, 2.0, np.nan, 3.0, 1.0, 2.0])
+        result = rsi(close, 4)
+        self.assertAlmostEqual(result[4], 100 - 100 / (1 + 0.5))
+        self.assertAlmostEqual(result[5], 100 - 100 / (1 + 0.625 / 0.75))
+
+    def test_first_change_after_missing_window_seeds_averages(self):
+        close = np.array([np.nan, np.nan, np.nan, 2.0, 3.0, 1.0])
+        result = rsi(close, 2)
+        self.assertTrue(np.isnan(result[:4]).all())
+        self.assertEqual(result[4], 100.0)
+        self.assertAlmostEqual(result[5], 100 - 100 / (1 + 0.5 / 1.0))
+
+    def test_rsi_by_date_uses_quote_date_keys(self):
+        dates = pd.date_range("2020-01-02", periods=5, freq="B")
+        close = pd.Series([1.0, 2.0, 1.0, 2.0, 3.0], index=dates)
+
+        rsi_values = rsi_by_date(close, 2)
+
+        self.assertEqual(list(rsi_values), list(dates.strftime("%Y-%m-%d")))
+        self.assertEqual(list(rsi_values)[0], "2020-01-02")
+        self.assertEqual(rsi_values["2020-01-06"], 50.0)
+        self.assertEqual(rsi_values["2020-01-08"], 87.5)
+        self.assertTrue(np.isnan(rsi_values["2020-01-03"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,205 @@
+import importlib.util
+import sqlite3
+import tempfile
+import unittest
+from datetime import date
+from pathlib import Path
+
+from options_analysis import (
+    ContractType,
+    OptionsDatabase,
+    PositionType,
+)
+from options_parquet import ArrowOptionsDatabase
+
+SCRIPTS_PATH = Path(__file__).parent
+
+QUOTE_DATES = ["2020-01-02", "2020-01-03", "2020-01-06"]
+EXPIRE_DATES = {
+    "2020-01-02": ["2020-01-10", "2020-01-17", "2020-02-21"],
+    "2020-01-03": ["2020-01-10", "2020-01-17", "2020-02-21"],
+    # No expiry 30 days out on this quote date
+    "2020-01-06": ["2020-01-10"],
+}
+UNDERLYING_LAST = 3205.0
+# Higher strikes are stored first, so tied strikes are not already in strike order.
+# 3200 and 3210 are the same distance from the underlying, and the put/call deltas are
+# chosen so that two strikes are equally close to the required deltas below
+STRIKES = [3220.0, 3210.0, 3200.0, 3190.0]
+PUT_DELTAS = {3190.0: -0.25, 3200.0: -0.5, 3210.0: -0.75, 3220.0: -1.0}
+REQUIRED_DELTA = 0.375
+
+
+def load_script(name):
+    spec = importlib.util.spec_from_file_location(
+        name.replace("-", "_"), SCRIPTS_PATH / f"{name}.py"
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def options_data_rows():
+    for quote_date in QUOTE_DATES:
+        for expire_date in EXPIRE_DATES[quote_date]:
+            dte = float(
+                (date.fromisoformat(expire_date) - date.fromisoformat(quote_date)).days
+            )
+            for strike in STRIKES:
+                p_delta = PUT_DELTAS[strike]
+                yield {
+                    "QUOTE_UNIXTIME": 1577900000,
+                    "QUOTE_READTIME": f"{quote_date} 16:00",
+                    "QUOTE_DATE": quote_date,
+                    "QUOTE_TIME_HOURS": "16.000000",
+                    "UNDERLYING_LAST": UNDERLYING_LAST,
+                    "EXPIRE_DATE": expire_date,
+                    "EXPIRE_UNIX": 1579294800,
+                    "DTE": dte,
+                    "C_DELTA": 1 + p_delta,
+                    "C_LAST": (UNDERLYING_LAST - strike) + dte,
+                    "C_SIZE": "1 x 1",
+                    "STRIKE": strike,
+                    "P_SIZE": "1 x 1",
+                    "P_LAST": (strike - 3100) / 10 + dte,
+                    "P_DELTA": p_delta,
+                    "STRIKE_DISTANCE": abs(strike - UNDERLYING_LAST),
+                    "STRIKE_DISTANCE_PCT": abs(strike - UNDERLYING_LAST)
+                    / UNDERLYING_LAST,
+                }
+
+
+def create_options_data(db_path):
+    importer = load_script("optionsdx-data-importer")
+    conn = sqlite3.connect(db_path)
+    importer.verify_database_structure(conn.cursor())
+    for row in options_data_rows():
+        conn.execute(
+            f"INSERT INTO options_data ({', '.join(row)}) VALUES ({', '.join('?' * len(row))})",
+            list(row.values()),
+        )
+    conn.commit()
+    return conn
+
+
+class TestArrowOptionsDatabaseParity(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        temp_path = Path(self.temp_dir.name)
+        options_db_path = temp_path / "options.db"
+        parquet_path = temp_path / "options_parquet"
+
+        conn = create_options_data(options_db_path)
+        load_script("options-data-export-parquet").export_options_data(
+            conn, parquet_path
+        )
+        conn.close()
+
+        self.sqlite_db = OptionsDatabase(options_db_path, "parity")
+        self.arrow_db = ArrowOptionsDatabase(
+            temp_path / "trades.db", parquet_path, "parity"
+        )
+        self.sqlite_db.connect()
+        self.arrow_db.connect()
+
+    def tearDown(self):
+        self.sqlite_db.disconnect()
+        self.arrow_db.disconnect()
+        self.temp_dir.cleanup()
+
+    @staticmethod
+    def reconnect(options_db):
+        """Reconnecting starts with no cached lookups"""
+        options_db.disconnect()
+        options_db.connect()
+
+    def lookups(self, options_db, min_dte):
+        """Results of every lookup a strategy makes on each quote date"""
+        results = []
+        for quote_date in QUOTE_DATES:
+            next_expiry = options_db.get_next_expiry_by_dte(quote_date, min_dte)
+            results.append(next_expiry)
+            if not next_expiry:
+                continue
+
+            expiry_date = next_expiry[0]
+            results.append(
+                options_db.get_options_data_closest_to_price(quote_date, expiry_date)
+            )
+            for contract_type in ContractType:
+                for position_type in PositionType:
+                    results.append(
+                        options_db.get_options_by_delta(
+                            contract_type,
+                            position_type,
+                            quote_date,
+                            expiry_date,
+                            REQUIRED_DELTA,
+                        )
+                    )
+        return results
+
+    def preload(self, options_db, min_dte):
+        options_db.preload_next_expiries(QUOTE_DATES, min_dte)
+        options_db.preload_options_closest_to_price(QUOTE_DATES, min_dte)
+        for contract_type in ContractType:
+            for position_type in PositionType:
+                options_db.preload_options_by_delta(
+                    contract_type, position_type, QUOTE_DATES, min_dte, REQUIRED_DELTA
+                )
+
+    def test_quote_dates(self):
+        self.assertEqual(self.sqlite_db.get_quote_dates(), QUOTE_DATES)
+        self.assertEqual(self.arrow_db.get_quote_dates(), QUOTE_DATES)
+
+    def test_lookups_return_the_same_options(self):
+        for min_dte in (0, 10, 30, 100):
+            with self.subTest(min_dte=min_dte):
+                sqlite_results = self.lookups(self.sqlite_db, min_dte)
+                self.assertEqual(self.lookups(self.arrow_db, min_dte), sqlite_results)
+
+    def test_tied_options_pick_the_lowest_strike(self):
+        closest_to_price = self.sqlite_db.get_options_data_closest_to_price(
+            "2020-01-02", "2020-01-17"
+        )
+        short_put = self.sqlite_db.get_options_by_delta(
+            ContractType.PUT,
+            PositionType.SHORT,
+            "2020-01-02",
+            "2020-01-17",
+            REQUIRED_DELTA,
+        )
+        self.assertEqual(closest_to_price.strike, 3200.0)
+        self.assertEqual(short_put.strike, 3190.0)
+
+    def test_lookups_are_cached_until_reconnect(self):
+        expiry = self.sqlite_db.get_next_expiry_by_dte("2020-01-02", 10)
+        self.sqlite_db.seed_lookup_cache(
+            "get_next_expiry_by_dte", ("2020-01-02", 10), ("2020-02-21", 50.0)
+        )
+        self.assertEqual(
+            self.sqlite_db.get_next_expiry_by_dte(quote_date="2020-01-02", min_dte=10),
+            ("2020-02-21", 50.0),
+        )
+
+        self.reconnect(self.sqlite_db)
+        self.assertEqual(
+            self.sqlite_db.get_next_expiry_by_dte("2020-01-02", 10), expiry
+        )
+
+    def test_preloaded_lookups_return_the_same_options(self):
+        for min_dte in (0, 10, 30, 100):
+            with self.subTest(min_dte=min_dte):
+                self.reconnect(self.sqlite_db)
+                expected = self.lookups(self.sqlite_db, min_dte)
+
+                self.reconnect(self.sqlite_db)
+                self.reconnect(self.arrow_db)
+                self.preload(self.sqlite_db, min_dte)
+                self.preload(self.arrow_db, min_dte)
+                self.assertEqual(self.lookups(self.sqlite_db, min_dte), expected)
+                self.assertEqual(self.lookups(self.arrow_db, min_dte), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+import sqlite3
+import tempfile
+import unittest
+from argparse import Namespace
+from itertools import product
+from pathlib import Path
+
+from options_analysis import run_parameter_sweep, run_strategy
+from short_straddle_strategies import ShortStraddleStrategy
+from test_options_parquet import create_options_data
+
+DTE_LIST = [7, 14]
+PROFIT_TAKE_LIST = [2.0, 50.0]
+
+
+class TestParameterSweep(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.db_path = Path(self.temp_dir.name) / "options.db"
+        create_options_data(self.db_path).close()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def strategy_args(self, **params):
+        return Namespace(
+            **{
+                "db_path": self.db_path,
+                "max_open_trades": 2,
+                "trade_delay": None,
+                "force_close_after_days": None,
+                # Both DTEs have an expiry on these quote dates
+                "start_date": "2020-01-02",
+                "end_date": "2020-01-03",
+                "profit_take": None,
+                "stop_loss": None,
+                "number_of_contracts": 1,
+                "ladder_additional_contracts": False,
+                **params,
+            }
+        )
+
+    def run_rows(self, table_name, order_by):
+        with sqlite3.connect(self.db_path) as conn:
+            return conn.execute(
+                f"SELECT * FROM {table_name} ORDER BY {order_by}"
+            ).fetchall()
+
+    def test_sweep_matches_single_runs(self):
+        run_parameter_sweep(
+            ShortStraddleStrategy,
+            self.strategy_args(
+                dte=None,
+                dte_list=DTE_LIST,
+                profit_take_list=PROFIT_TAKE_LIST,
+                workers=1,
+            ),
+        )
+
+        with sqlite3.connect(self.db_path) as conn:
+            sweep_runs = conn.execute(
+                "SELECT RawParams, TableNameKey, TradeTableName, TradeLegsTableName FROM backtest_runs"
+            ).fetchall()
+
+        # One run per combination, each with its own tables
+        self.assertEqual(len(sweep_runs), len(DTE_LIST) * len(PROFIT_TAKE_LIST))
+        sweep_tag = sweep_runs[0][1].rsplit("_", 1)[0]
+        self.assertEqual(
+            sorted(table_name_key for _, table_name_key, _, _ in sweep_runs),
+            [f"{sweep_tag}_{idx}" for idx in range(len(sweep_runs))],
+        )
+
+        combinations = set()
+        trades_by_combination = {}
+        for raw_params, table_name_key, trades_table, legs_table in sweep_runs:
+            params = dict(param.split("=") for param in raw_params.split(","))
+            dte, profit_take = int(params["dte"]), float(params["profit_take"])
+            combinations.add((dte, profit_take))
+
+            run_strategy(
+                ShortStraddleStrategy,
+                self.strategy_args(
+                    dte=dte,
+                    profit_take=profit_take,
+                    table_name_key=f"single_{table_name_key}",
+                ),
+            )
+            with self.subTest(dte=dte, profit_take=profit_take):
+                trades = self.run_rows(trades_table, "TradeId")
+                self.assertTrue(trades)
+                self.assertEqual(
+                    trades,
+                    self.run_rows(
+                        trades_table.replace(
+                            table_name_key, f"single_{table_name_key}"
+                        ),
+                        "TradeId",
+                    ),
+                )
+                self.assertEqual(
+                    self.run_rows(legs_table, "rowid"),
+                    self.run_rows(
+                        legs_table.replace(table_name_key, f"single_{table_name_key}"),
+                        "rowid",
+                    ),
+                )
+            trades_by_combination[dte, profit_take] = trades
+
+        self.assertEqual(combinations, set(product(DTE_LIST, PROFIT_TAKE_LIST)))
+        # Every swept parameter changes the outcome of the backtest
+        self.assertEqual(
+            len({tuple(trades) for trades in trades_by_combination.values()}),
+            len(combinations),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()